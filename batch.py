@@ -0,0 +1,188 @@
+# NumPy で多数の盤面をまとめてシミュレーションする
+# 盤面は (N, 高さ, 幅) の uint8 配列で、セルの値は Tetris.grid と同じパレットの番号
+# （EMPTY / INITIAL / PIECE_BASE + 種類。爆弾ブロックは初期ブロックとして扱う）
+# ルールは Tetris.drop / Tetris.clear_rows と同じ（ホールドと NEXT 表示はなし）
+import numpy as np
+
+from pieces import PIECE_TYPES
+from tetris_core import (CELL_EMPTY, CELL_INITIAL, CELL_BOMB, CELL_PIECE, ACTION_LEFT, ACTION_RIGHT,
+                         ACTION_ROTATE_CW, ACTION_ROTATE_CCW, ACTION_SOFT_DROP, ACTION_HARD_DROP, ACTION_TICK)
+
+EMPTY = CELL_EMPTY
+INITIAL = CELL_INITIAL
+PIECE_BASE = CELL_PIECE  # テトリミノのセルは PIECE_BASE + 種類
+
+# 回転状態ごとのセル座標 [種類, 回転, セル]
+CELL_X = np.array([[[dx for dx, dy in state.cells] for state in piece_type.states]
+                   for piece_type in PIECE_TYPES], dtype=np.int64)
+CELL_Y = np.array([[[dy for dx, dy in state.cells] for state in piece_type.states]
+                   for piece_type in PIECE_TYPES], dtype=np.int64)
+SPAWN_OFFSET = np.array([[state.spawn_offset for state in piece_type.states]
+                         for piece_type in PIECE_TYPES], dtype=np.int64)
+
+
+class BatchTetris:
+    def __init__(self, n, width=10, height=20, seed=None):
+        self.n = n
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.index = np.arange(n)
+        self.grid = np.zeros((n, height, width), dtype=np.uint8)
+        self.kind = np.zeros(n, dtype=np.int64)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.initial_blocks_count = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+        self.game_won = np.zeros(n, dtype=bool)
+        self.spawn(np.ones(n, dtype=bool))
+
+    @classmethod
+    def from_games(cls, games, seed=None):
+        # Tetris オブジェクトの盤面と現在のテトリミノをまとめて読み込む
+        first = games[0]
+        batch = cls(len(games), first.width, first.height, seed)
+        for i, game in enumerate(games):
+            batch.grid[i] = np.frombuffer(game.grid, dtype=np.uint8).reshape(game.height, game.width)
+            piece = game.current_piece
+            batch.kind[i] = piece.kind
+            batch.rotation[i] = piece.rotation
+            batch.x[i] = piece.x
+            batch.y[i] = piece.y
+            batch.score[i] = game.score
+            batch.game_over[i] = game.game_over
+            batch.game_won[i] = game.game_won
+        batch.grid[batch.grid == CELL_BOMB] = INITIAL
+        batch.initial_blocks_count = batch.count_initial_blocks()
+        return batch
+
+    def active(self):
+        # まだ終了していない盤面
+        return ~(self.game_over | self.game_won)
+
+    def count_initial_blocks(self):
+        return (self.grid == INITIAL).sum(axis=(1, 2))
+
+    def row_masks(self):
+        # 行ごとのビットマスク (N, 高さ)、列 x は x ビット目
+        weights = np.left_shift(np.int64(1), np.arange(self.width, dtype=np.int64))
+        return (self.grid != EMPTY).astype(np.int64) @ weights
+
+    def _cells(self, kind, rotation, x, y):
+        return CELL_X[kind, rotation] + x[:, None], CELL_Y[kind, rotation] + y[:, None]
+
+    def _fits(self, idx, kind, rotation, x, y):
+        # idx の盤面だけを調べる（引数は idx と同じ長さ）
+        cx, cy = self._cells(kind, rotation, x, y)
+        inside = (cx >= 0) & (cx < self.width) & (cy < self.height)
+        filled = self.grid[idx[:, None], np.clip(cy, 0, self.height - 1),
+                           np.clip(cx, 0, self.width - 1)] != EMPTY
+        return (inside & ((cy < 0) | ~filled)).all(axis=1)
+
+    def _active_index(self, mask):
+        active = self.active() if mask is None else mask & self.active()
+        return np.nonzero(active)[0]
+
+    def valid_position(self, kind, rotation, x, y):
+        # 各盤面でテトリミノを配置できるか (N,) の bool 配列で返す
+        return self._fits(self.index, kind, rotation, x, y)
+
+    def spawn(self, mask):
+        # 新しいテトリミノを出現させ、置けなければゲームオーバー
+        idx = np.nonzero(mask)[0]
+        if not idx.size:
+            return
+        kinds = self.rng.integers(0, len(PIECE_TYPES), size=idx.size)
+        self.kind[idx] = kinds
+        self.rotation[idx] = 0
+        self.x[idx] = self.width // 2 - SPAWN_OFFSET[kinds, 0]
+        self.y[idx] = 0
+        blocked = ~self._fits(idx, kinds, self.rotation[idx], self.x[idx], self.y[idx])
+        self.game_over[idx[blocked]] = True
+
+    def move(self, dx, dy, mask=None):
+        # 動かせた盤面を (N,) の bool 配列で返す
+        idx = self._active_index(mask)
+        ok = self._fits(idx, self.kind[idx], self.rotation[idx], self.x[idx] + dx, self.y[idx] + dy)
+        idx = idx[ok]
+        self.x[idx] += dx
+        self.y[idx] += dy
+        moved = np.zeros(self.n, dtype=bool)
+        moved[idx] = True
+        return moved
+
+    def rotate(self, clockwise=True, mask=None):
+        idx = self._active_index(mask)
+        rotation = (self.rotation[idx] + (1 if clockwise else -1)) % 4
+        ok = self._fits(idx, self.kind[idx], rotation, self.x[idx], self.y[idx])
+        self.rotation[idx[ok]] = rotation[ok]
+        rotated = np.zeros(self.n, dtype=bool)
+        rotated[idx[ok]] = True
+        return rotated
+
+    def lock(self, mask):
+        # テトリミノを盤面に固定
+        idx = np.nonzero(mask)[0]
+        if not idx.size:
+            return
+        cx, cy = self._cells(self.kind[idx], self.rotation[idx], self.x[idx], self.y[idx])
+        rows = np.broadcast_to(idx[:, None], cx.shape)
+        values = np.broadcast_to((PIECE_BASE + self.kind[idx])[:, None], cx.shape).astype(np.uint8)
+        inside = cy >= 0
+        self.grid[rows[inside], cy[inside], cx[inside]] = values[inside]
+
+    def clear_rows(self, mask=None):
+        # 埋まった行を消去して上の行を詰め、消去した行数 (N,) を返す
+        idx = self.index if mask is None else np.nonzero(mask)[0]
+        cleared = np.zeros(self.n, dtype=np.int64)
+        if not idx.size:
+            return cleared
+        grids = self.grid[idx]
+        full = (grids != EMPTY).all(axis=2)
+        counts = full.sum(axis=1)
+        hit = np.nonzero(counts)[0]
+        if hit.size:
+            grids, full = grids[hit], full[hit]
+            initial_cleared = ((grids == INITIAL) & full[:, :, None]).sum(axis=(1, 2))
+            # 埋まった行を上に、残りの行を元の順番のまま下に並べ替えてから上の行を空にする
+            order = np.argsort(~full, axis=1, kind='stable')
+            grids = np.take_along_axis(grids, order[:, :, None], axis=1)
+            grids[np.arange(self.height)[None, :] < counts[hit][:, None]] = EMPTY
+            boards = idx[hit]
+            self.grid[boards] = grids
+            self.initial_blocks_count[boards] -= initial_cleared
+            cleared[boards] = counts[hit]
+        self.game_won[idx[self.initial_blocks_count[idx] <= 0]] = True
+        return cleared
+
+    def drop(self, mask=None):
+        # Tetris.drop と同じ: 1マス落とし、落とせなければ固定・行消去・次のテトリミノ
+        # 固定した盤面を (N,) の bool 配列で返す
+        active = np.zeros(self.n, dtype=bool)
+        active[self._active_index(mask)] = True
+        locked = active & ~self.move(0, 1, active)
+        if locked.any():
+            self.lock(locked)
+            self.score += self.clear_rows(locked) * 100
+            self.spawn(locked & ~self.game_won)
+        return locked
+
+    def hard_drop(self, mask=None):
+        falling = self.active() if mask is None else mask & self.active()
+        while falling.any():
+            falling = self.move(0, 1, falling)
+        return self.drop(mask)
+
+    def step(self, actions):
+        # 盤面ごとの操作 (N,) をまとめて適用し、固定した盤面を返す
+        actions = np.asarray(actions)
+        self.move(-1, 0, actions == ACTION_LEFT)
+        self.move(1, 0, actions == ACTION_RIGHT)
+        self.rotate(True, actions == ACTION_ROTATE_CW)
+        self.rotate(False, actions == ACTION_ROTATE_CCW)
+        self.move(0, 1, actions == ACTION_SOFT_DROP)
+        locked = self.hard_drop(actions == ACTION_HARD_DROP)
+        locked |= self.drop(actions == ACTION_TICK)
+        return locked
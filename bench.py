@@ -0,0 +1,440 @@
+# ゲームの主要な処理のベンチマーク
+# 固定のシードと盤面で各処理を繰り返し、1秒あたりの実行回数と1回あたりのメモリ割り当て量を測る
+# 描画は SDL のダミードライバーを使って画面外のサーフェスに行う（ウィンドウは開かない）
+# 使い方:
+#   python bench.py                               # すべて実行
+#   python bench.py -k drop                       # 名前に drop を含むものだけ
+#   python bench.py --save bench_baseline.json    # 結果を基準値として保存
+#   python bench.py --compare bench_baseline.json # 基準値と比べ、遅くなったものがあれば終了コード 1
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from pieces import Piece, PIECE_TYPES
+from tetris_core import Tetris, CELL_INITIAL, CELL_PIECE
+
+SEED = 20240501
+BACKENDS = (('bitboard', True), ('list', False))
+
+# 下4行が埋まった盤面（'#' は初期ブロック、'o' はテトリミノのブロック、'.' は空き）
+FULL_ROWS_BOARD = [
+    '..........',
+] * 12 + [
+    '...##.....',
+    '..####..#.',
+    '.######.##',
+    '.#########',
+    'oooo##oooo',
+    '#oooooooo#',
+    'oo##oooooo',
+    'oooooooo##',
+]
+
+# 左端の列だけが空いた盤面（縦の I を落とすと4行消える）
+WELL_BOARD = FULL_ROWS_BOARD[:16] + [
+    '.ooo##oooo',
+    '.ooooooo##',
+    '.o##oooooo',
+    '.ooooooo##',
+]
+
+# 大きな盤面（耐久モードや負荷試験用）の大きさ
+TALL_WIDTH = 100
+TALL_HEIGHT = 1000
+
+# 初期ブロック以外のマスに使う色
+PIECE_CELL = CELL_PIECE + 2
+
+BENCHMARKS = {}  # 名前 -> setup 関数
+
+
+def benchmark(name, backends=True):
+    # setup(game) は (op, reset, 1回の op で行う処理の数) を返す
+    # reset は None でなければ op の前に毎回呼ばれ、時間には含めない
+    # backends=True なら盤面の実装ごとに別々に測る
+    def register(setup):
+        if backends:
+            for backend, use_bitboard in BACKENDS:
+                BENCHMARKS[f"{name}[{backend}]"] = (setup, use_bitboard)
+        else:
+            BENCHMARKS[name] = (setup, True)
+        return setup
+    return register
+
+
+def make_game(use_bitboard):
+    return Tetris(use_bitboard=use_bitboard, seed=SEED)
+
+
+def load_board(game, rows):
+    # 文字列の盤面を読み込む（ゲームの状態も開始時に戻す）
+    grid = bytearray(game.width * game.height)
+    counts = [0] * game.height
+    for y, row in enumerate(rows):
+        for x, c in enumerate(row):
+            if c == '#':
+                grid[y * game.width + x] = CELL_INITIAL
+                counts[y] += 1
+            elif c == 'o':
+                grid[y * game.width + x] = PIECE_CELL
+    # 盤面の bytearray はボードと共有しているので中身だけを入れ替える
+    game.grid[:] = grid
+    if game.board is not None:
+        game.board.rebuild()
+    game.initial_row_counts[:] = counts
+    game.initial_blocks_count = sum(counts)
+    game.game_over = False
+    game.game_won = False
+    game.can_hold = True
+    game.score = 0
+
+
+def vertical_i(game, x):
+    # 列 x に置く縦向きの I
+    rotation = 1
+    state = PIECE_TYPES[0].states[rotation]
+    dx = state.cells[0][0]
+    return Piece(0, rotation, x - dx, 0)
+
+
+# ---- ゲームのルール部分 ----
+
+@benchmark('valid_position')
+def bench_valid_position(game):
+    load_board(game, FULL_ROWS_BOARD)
+    states = [state for piece_type in PIECE_TYPES for state in piece_type.states]
+    positions = [(state, x, y) for state in states for x in range(-1, 9, 3) for y in (0, 10, 15)]
+    valid_position = game.valid_position
+
+    def op():
+        for state, x, y in positions:
+            valid_position(state, x, y)
+    return op, None, len(positions)
+
+
+@benchmark('rotate')
+def bench_rotate(game):
+    load_board(game, FULL_ROWS_BOARD)
+    game.current_piece = Piece.spawn(2, game.width).moved(0, 5)
+
+    def op():
+        game.rotate(True)
+    return op, None, 1
+
+
+@benchmark('move')
+def bench_move(game):
+    load_board(game, FULL_ROWS_BOARD)
+    game.current_piece = Piece.spawn(2, game.width).moved(0, 5)
+    direction = [1]
+
+    def op():
+        # 壁に当たったら向きを変える
+        if not game.move(direction[0], 0):
+            direction[0] = -direction[0]
+    return op, None, 1
+
+
+@benchmark('drop_clear')
+def bench_drop_clear(game):
+    # 縦の I が固定されて4行消える drop
+    piece = vertical_i(game, 0)
+
+    def reset():
+        load_board(game, WELL_BOARD)
+        game.current_piece = piece.moved(0, game.landing_row(piece) - piece.y)
+
+    def op():
+        game.drop()
+    return op, reset, 1
+
+
+@benchmark('drop_clear_tall')
+def bench_drop_clear_tall(game):
+    # 大きな盤面で縦の I が固定されて4行消える drop（詰める手間が盤面の高さによらないことの確認用）
+    game = Tetris(use_bitboard=game.use_bitboard, seed=SEED, width=TALL_WIDTH, height=TALL_HEIGHT)
+    board = ['.' * TALL_WIDTH] * (TALL_HEIGHT - 4) + ['.' + '#' * 4 + 'o' * (TALL_WIDTH - 5)] * 4
+    piece = vertical_i(game, 0)
+    load_board(game, board)
+    game.current_piece = piece.moved(0, game.landing_row(piece) - piece.y)
+    start = game.snapshot()  # 盤面の読み込みは遅いので、毎回は snapshot から戻す
+
+    def reset():
+        game.restore(start)
+
+    def op():
+        game.drop()
+    return op, reset, 1
+
+
+@benchmark('clear_rows')
+def bench_clear_rows(game):
+    def reset():
+        load_board(game, FULL_ROWS_BOARD)
+
+    def op():
+        game.clear_rows()
+    return op, reset, 1
+
+
+@benchmark('hard_drop')
+def bench_hard_drop(game):
+    # 空の盤面に次々とハードドロップし、上半分まで積み上がったら盤面を戻す
+    middle = game.height // 2 * game.width
+
+    def reset():
+        if game.game_over or any(game.grid[middle:middle + game.width]):
+            load_board(game, [])
+            game.current_piece = game.get_next_piece()
+
+    def op():
+        game.hard_drop()
+    return op, reset, 1
+
+
+@benchmark('setup_initial_blocks')
+def bench_setup_initial_blocks(game):
+    def reset():
+        load_board(game, [])
+        game.rng.seed(SEED)
+
+    def op():
+        game.setup_initial_blocks()
+    return op, reset, 1
+
+
+@benchmark('load_level')
+def bench_load_level(game):
+    # レベルパックから読んだ初期配置を置く（setup_initial_blocks と同じ配置）
+    source = Tetris(seed=SEED)
+    width = source.width
+    rows = [sum(1 << x for x, cell in enumerate(source.grid[y * width:(y + 1) * width]) if cell == CELL_INITIAL)
+            for y in range(source.height)]
+
+    def reset():
+        load_board(game, [])
+
+    def op():
+        game.load_level(rows)
+    return op, reset, 1
+
+
+@benchmark('reset_game')
+def bench_reset_game(game):
+    def op():
+        game.reset_game(SEED)
+    return op, None, 1
+
+
+@benchmark('snapshot')
+def bench_snapshot(game):
+    # 固定と固定の間のスナップショット（盤面と NEXT は前回のものを使い回す）
+    game.reset_game(SEED)
+    game.snapshot()
+
+    def op():
+        game.snapshot()
+    return op, None, 1
+
+
+@benchmark('restore')
+def bench_restore(game):
+    # 1個固定する前と後のスナップショットを交互に戻す（盤面・NEXT・乱数をすべて戻す）
+    game.reset_game(SEED)
+    before = game.snapshot()
+    game.hard_drop()
+    after = game.snapshot()
+
+    def op():
+        game.restore(before)
+        game.restore(after)
+    return op, None, 2
+
+
+# ---- 描画 ----
+
+_screen = None
+
+
+def offscreen():
+    # ダミードライバーで pygame を初期化し、画面外のサーフェスを返す
+    global _screen
+    if _screen is None:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        import tetris
+        pygame = tetris.load_pygame()
+        pygame.display.init()
+        pygame.font.init()
+        pygame.display.set_mode((tetris.SCREEN_WIDTH, tetris.SCREEN_HEIGHT))
+        _screen = pygame.Surface((tetris.SCREEN_WIDTH, tetris.SCREEN_HEIGHT))
+    return _screen
+
+
+def draw_benchmark(name, draw):
+    # draw(tetris, screen, game) を1回の op とする描画のベンチマーク
+    def setup(game):
+        screen = offscreen()
+        import tetris
+        load_board(game, FULL_ROWS_BOARD)
+        game.current_piece = Piece.spawn(5, game.width).moved(0, 3)
+        game.hold_piece = Piece.spawn(0, game.width)
+
+        def op():
+            draw(tetris, screen, game)
+        return op, None, 1
+    benchmark(name, backends=False)(setup)
+
+
+draw_benchmark('draw_hold_piece', lambda t, screen, game: t.draw_hold_piece(screen, game.hold_piece))
+draw_benchmark('draw_next_pieces', lambda t, screen, game: t.draw_next_pieces(screen, game.next_pieces))
+draw_benchmark('draw_grid_lines', lambda t, screen, game: t.draw_grid_lines(screen))
+draw_benchmark('draw_score_area',
+               lambda t, screen, game: t.draw_score_area(screen, game.score, game.initial_blocks_count))
+draw_benchmark('draw_controls', lambda t, screen, game: t.draw_controls(screen))
+draw_benchmark('draw_start_screen', lambda t, screen, game: t.draw_start_screen(screen))
+draw_benchmark('draw_game_over_screen', lambda t, screen, game: t.draw_game_over_screen(screen, 1200, False))
+
+
+@benchmark('renderer_full', backends=False)
+def bench_renderer_full(game):
+    # 画面全体を描き直すフレーム
+    screen = offscreen()
+    import tetris
+    load_board(game, FULL_ROWS_BOARD)
+    renderer = tetris.Renderer(screen)
+
+    def op():
+        renderer.draw(game)
+    return op, renderer.invalidate, 1
+
+
+@benchmark('renderer_move', backends=False)
+def bench_renderer_move(game):
+    # テトリミノが1マス動いたフレーム（変わったマスだけを描き直す）
+    screen = offscreen()
+    import tetris
+    load_board(game, FULL_ROWS_BOARD)
+    renderer = tetris.Renderer(screen)
+    renderer.draw(game)
+    direction = [1]
+
+    def op():
+        if not game.move(direction[0], 0):
+            direction[0] = -direction[0]
+        renderer.draw(game)
+    return op, None, 1
+
+
+# ---- 計測 ----
+
+def measure(name, min_time=0.2, repeat=5, alloc_ops=20):
+    # (1秒あたりの実行回数, 1回あたりの最大割り当てバイト数) を返す
+    setup, use_bitboard = BENCHMARKS[name]
+    game = make_game(use_bitboard)
+    op, reset, per_op = setup(game)
+    perf_counter = time.perf_counter
+
+    def run(n):
+        # n 回実行してかかった時間を返す（reset の時間は含めない）
+        if reset is None:
+            start = perf_counter()
+            for _ in range(n):
+                op()
+            return perf_counter() - start
+        total = 0.0
+        for _ in range(n):
+            reset()
+            start = perf_counter()
+            op()
+            total += perf_counter() - start
+        return total
+
+    # 1回の計測が min_time 程度になる回数を求める
+    n = 1
+    while True:
+        elapsed = run(n)
+        if elapsed >= min_time / 10 or n >= 1 << 24:
+            break
+        n *= 2
+    n = max(1, int(n * min_time / max(elapsed, 1e-9)))
+    best = min(run(n) for _ in range(repeat))
+    ops_per_sec = n * per_op / best
+
+    # メモリ割り当ては計測を遅くするので別に測る
+    tracemalloc.start()
+    peaks = []
+    for _ in range(alloc_ops):
+        if reset is not None:
+            reset()
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        op()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    alloc = sum(peaks) / len(peaks) / per_op
+    return ops_per_sec, alloc
+
+
+def compare(results, baseline, tolerance):
+    # 基準値より tolerance 以上遅くなったもの・割り当てが増えたものの名前を返す
+    regressions = []
+    print()
+    print(f"{'benchmark':<32}{'baseline':>14}{'now':>14}{'ratio':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32}{'-':>14}{result['ops_per_sec']:>14,.0f}{'new':>8}")
+            continue
+        ratio = result['ops_per_sec'] / base['ops_per_sec']
+        slower = ratio < 1 - tolerance
+        more_alloc = result['alloc_bytes'] > base['alloc_bytes'] * (1 + tolerance) + 64
+        mark = '  SLOWER' if slower else ''
+        mark += '  ALLOC' if more_alloc else ''
+        print(f"{name:<32}{base['ops_per_sec']:>14,.0f}{result['ops_per_sec']:>14,.0f}{ratio:>8.2f}{mark}")
+        if slower or more_alloc:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tetrimino Break のベンチマーク')
+    parser.add_argument('-k', dest='keyword', help='名前にこの文字列を含むものだけ実行')
+    parser.add_argument('--min-time', type=float, default=0.2, help='1回の計測の目安の時間（秒）')
+    parser.add_argument('--save', metavar='PATH', help='結果を基準値として保存')
+    parser.add_argument('--compare', metavar='PATH', help='保存した基準値と比較')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='遅くなったとみなす割合（既定 0.15 = 15%%）')
+    parser.add_argument('--no-render', action='store_true', help='描画のベンチマークを除く')
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS
+             if (args.keyword is None or args.keyword in name) and
+             not (args.no_render and (name.startswith('draw_') or name.startswith('renderer_')))]
+    results = {}
+    print(f"{'benchmark':<32}{'ops/sec':>14}{'alloc B/op':>12}")
+    for name in names:
+        ops_per_sec, alloc = measure(name, args.min_time)
+        results[name] = {'ops_per_sec': round(ops_per_sec, 1), 'alloc_bytes': round(alloc, 1)}
+        print(f"{name:<32}{ops_per_sec:>14,.0f}{alloc:>12,.0f}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'seed': SEED, 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
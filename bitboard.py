@@ -0,0 +1,237 @@
+# 行ごとの整数ビットマスクで盤面を管理するバックエンド
+# 列 x のブロックは各行のマスクの x ビット目に対応する
+# セルの値（パレットの番号）は描画用に別の bytearray (cells、行 y の列 x は y * width + x) で保持する
+# 落下位置の計算用に、列ごとのマスク (columns、行 y は height - 1 - y ビット目) も保持する
+# 列マスクは一番下の行を 0 ビット目にしているので、整数の大きさは盤面の高さではなく積み上がった高さで決まる
+
+
+def shape_masks(shape):
+    # テトリミノの形状を行ごとのビットマスクに変換
+    return tuple(sum(1 << j for j, cell in enumerate(row) if cell) for row in shape)
+
+
+class BitBoard:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.full_mask = (1 << width) - 1  # すべて埋まった行のマスク
+        self.rows = [0] * height
+        self.columns = [0] * width
+        self.cells = bytearray(width * height)
+        self.top = height  # ブロックがある一番上の行（空の盤面では height、ブロックを置く・消すたびに更新）
+
+    def set_cell(self, x, y, value):
+        # 1マスを設定し、マスクも更新
+        self.cells[y * self.width + x] = value
+        bit = 1 << (self.height - 1 - y)
+        if value:
+            self.rows[y] |= 1 << x
+            self.columns[x] |= bit
+            self.top = min(self.top, y)
+        else:
+            self.rows[y] &= ~(1 << x)
+            self.columns[x] &= ~bit
+            self.skip_empty_rows()
+
+    def rebuild(self):
+        # cells を直接書き換えた後にマスクを再計算
+        width = self.width
+        cells = self.cells
+        columns = [0] * width
+        for y in range(self.height):
+            mask = 0
+            bit = 1 << (self.height - 1 - y)
+            for x, cell in enumerate(cells[y * width:(y + 1) * width]):
+                if cell:
+                    mask |= 1 << x
+                    columns[x] |= bit
+            self.rows[y] = mask
+        self.columns = columns
+        self.top = 0
+        self.skip_empty_rows()
+
+    def skip_empty_rows(self):
+        # top の行が空なら、ブロックのある行まで top を下げる
+        rows = self.rows
+        top = self.top
+        while top < self.height and not rows[top]:
+            top += 1
+        self.top = top
+
+    def collides(self, masks, x, y):
+        # 行マスクで表したテトリミノが (x, y) で壁やブロックに重なるか確認
+        rows = self.rows
+        for i, mask in enumerate(masks):
+            if not mask:
+                continue
+            if x >= 0:
+                mask <<= x
+                if mask > self.full_mask:  # 右の壁からはみ出す
+                    return True
+            else:
+                if mask & ((1 << -x) - 1):  # 左の壁からはみ出す
+                    return True
+                mask >>= -x
+            r = y + i
+            if r >= self.height:
+                return True
+            if r >= 0 and rows[r] & mask:
+                return True
+        return False
+
+    def place(self, masks, cells, x, y, value):
+        # テトリミノを盤面に固定
+        # masks は行マスク、cells はセルの (列, 行) のタプル（RotationState の masks と cells）
+        rows = self.rows
+        for i, mask in enumerate(masks):
+            if not mask:
+                continue
+            r = y + i
+            if r < self.top:
+                self.top = r
+            rows[r] |= mask << x if x >= 0 else mask >> -x
+        board = self.cells
+        columns = self.columns
+        width = self.width
+        base = self.height - 1 - y  # y の行の列マスクのビット
+        for j, i in cells:
+            board[(y + i) * width + x + j] = value
+            columns[x + j] |= 1 << (base - i)
+
+    def drop_distance(self, bottoms, x, y):
+        # (x, y) にあるテトリミノが何マス下に落ちられるかを列マスクから直接求める
+        # bottoms は (列, その列の一番下のセルの行) のタプル
+        height = self.height
+        distance = height
+        columns = self.columns
+        for dx, bottom in bottoms:
+            b = height - 2 - y - bottom  # セルのすぐ下のマスのビット
+            if b < 0:  # 一番下の行にある
+                return 0
+            below = columns[x + dx]
+            if below.bit_length() > b + 1:
+                below &= (2 << b) - 1  # セルより上のブロックは除く
+            # 一番近いブロックまでの空きマス数（ブロックがなければ一番下まで）
+            d = b - below.bit_length() + 1
+            if d < distance:
+                distance = d
+        return distance
+
+    def full_rows(self, top=0):
+        # 埋まっている行の番号を上から順に返す（top より上の行は空として調べない）
+        full = self.full_mask
+        return [i for i, mask in enumerate(self.rows[top:], top) if mask == full]
+
+    def top_row(self):
+        # ブロックがある一番上の行（空の盤面では height）
+        return self.top
+
+    def remove_rows(self, indices, top=None):
+        # 指定した行を消去し、上の行を詰めて空行を上に追加
+        # cells は描画側が参照しているので、bytearray 自体は差し替えずに中身を入れ替える
+        # ブロックのある一番上の行 (top、省略時は self.top) より上は空なので、詰めるのはそこから下だけ
+        removed = sorted(set(indices))
+        if not removed:
+            return
+        if top is None:
+            top = self.top
+        first = removed[0]
+        last = removed[-1]
+        count = len(removed)
+        top = min(top, first)
+        if last - first + 1 == count:
+            self.remove_block(top, first, last)
+        else:
+            self.remove_scattered(removed, top)
+        # 消した行の数だけ上の行が下がる（その下に空の行があればさらに下げる）
+        self.top = min(self.height, top + count)
+        self.skip_empty_rows()
+
+    def remove_block(self, top, first, last):
+        # 続いた行 first〜last を消去する（ほとんどの消去はこれ）
+        # rows・cells・columns のどれも、上のまとまり (top〜first-1) を1回ずらすだけで済む
+        count = last - first + 1
+        width = self.width
+        columns = self.columns
+        low = (1 << (self.height - 1 - last)) - 1  # 消去する行より下の列マスクのビット
+        if first == top:
+            # 積み上がった一番上から消す場合は、ずらす行がないので消すだけ
+            columns[:] = [column & low for column in columns]
+            self.rows[first:last + 1] = [0] * count
+            self.cells[first * width:(last + 1) * width] = bytes(count * width)
+            return
+        start = self.height - first  # 上のまとまりの一番下のビット
+        to = start - count
+        columns[:] = [column & low | column >> start << to for column in columns]
+        rows = self.rows
+        rows[top:last + 1] = [0] * count + rows[top:first]
+        cells = self.cells
+        cells[top * width:(last + 1) * width] = bytes(count * width) + cells[top * width:first * width]
+
+    def remove_scattered(self, removed, top):
+        # 離れた行をまとめて消去する（爆弾の爆発など）
+        # 列マスクは消去した行のビットを抜き、その上のまとまりを下にずらす
+        # まとまりの位置とずらす量を先に求めておき、各列は1回ずつ書き換える
+        bits = [self.height - 1 - r for r in reversed(removed)]  # 消去する行のビット（下から順）
+        low = (1 << bits[0]) - 1  # 一番下の消去行より下はそのまま
+        segments = []  # (まとまりの一番下のビット, まとまりのマスク（None は一番上まで）, ずらした先のビット)
+        for i, b in enumerate(bits):
+            mask = None
+            if i + 1 < len(bits):
+                length = bits[i + 1] - b - 1
+                if not length:
+                    continue
+                mask = (1 << length) - 1
+            segments.append((b + 1, mask, b - i))
+        self.compact_columns(low, segments)
+        remove_cell_rows(self.rows, 1, removed, top)
+        remove_cell_rows(self.cells, self.width, removed, top)
+
+    def compact_columns(self, low, segments):
+        # 各列のマスクから消去した行のビットを抜いて詰める（segments は remove_rows を参照）
+        columns = self.columns
+        for x, column in enumerate(columns):
+            compacted = column & low
+            for start, mask, to in segments:
+                part = column >> start
+                if mask is not None:
+                    part &= mask
+                compacted |= part << to
+            columns[x] = compacted
+
+
+_zeros = memoryview(b'')  # top_cell_row で比べる空の行（必要な長さまで伸ばして使い回す）
+
+
+def top_cell_row(cells, width):
+    # ブロックがある一番上の行（空の盤面では高さ）を cells から求める
+    # 先頭から空の行が何行続くかを二分探索する（比較は memcmp なので盤面が大きくても速い）
+    global _zeros
+    if len(_zeros) < len(cells):
+        _zeros = memoryview(bytes(len(cells)))
+    low, high = 0, len(cells) // width
+    while low < high:
+        middle = (low + high + 1) // 2
+        if cells.startswith(_zeros[:middle * width]):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def remove_cell_rows(cells, width, removed, top=0):
+    # 行の並び (cells) から removed の行を除き、上に同じ数の空行を足す（cells 自体を書き換える）
+    # 消す行と消す行の間のまとまりを、下のまとまりから順に1回ずつ下へずらす
+    # top より上の行は空であること（詰めるのは top から下だけなので、手間は盤面の高さによらない）
+    # cells は1行 width 個の bytearray か、1行1要素のリスト（width=1）
+    rows = sorted(removed)
+    if not rows:
+        return
+    top = min(top, rows[0])
+    shift = 0
+    for i in range(len(rows) - 1, -1, -1):
+        shift += 1
+        start = rows[i - 1] + 1 if i else top
+        if start < rows[i]:
+            cells[(start + shift) * width:(rows[i] + shift) * width] = cells[start * width:rows[i] * width]
+    cells[top * width:(top + shift) * width] = bytes(shift * width)
@@ -0,0 +1,411 @@
+# テトリミノの置き場所を探索して自動でプレイする AI（pygame に依存しない）
+# 盤面は行ごとの整数ビットマスク（BitBoard と同じく列 x が x ビット目）のタプルで扱う
+# 1. 現在のテトリミノとホールドのテトリミノについて、移動・回転・ソフトドロップで
+#    到達できるすべての固定位置を幅優先探索で列挙する
+# 2. 各固定位置を高さ・穴・凸凹・消去行数・消去した初期ブロックの数で評価する
+# 3. NEXT のテトリミノを使ってビームサーチで数手先まで読み、最も評価の高い1手目を選ぶ
+# (盤面, テトリミノ) ごとの列挙結果はキャッシュし、次のテトリミノの判断でも再利用する
+import time
+from collections import deque
+
+from pieces import PIECE_TYPES
+from tetris_core import (CELL_INITIAL, CELL_BOMB, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE_CW,
+                         ACTION_ROTATE_CCW, ACTION_HOLD, ACTION_SOFT_DROP, ACTION_HARD_DROP)
+
+# 評価の重み（高さ・穴・凸凹・消去行数はよく使われる値、初期ブロックはこのゲーム用）
+DEFAULT_WEIGHTS = {
+    'height': -0.51,    # 各列の高さの合計
+    'holes': -0.36,     # 上をふさがれた空きマスの数
+    'bumpiness': -0.18,  # 隣り合う列の高さの差の合計
+    'lines': 0.76,      # 消去した行数
+    'initial': 1.0,     # 消去した初期ブロックの数
+    'initial_holes': -0.5,  # 初期ブロックが残っている行の穴の数
+    'initial_gaps': -0.1,   # 初期ブロックが残っている行の空きマスの数
+    'win': 1000.0,      # 初期ブロックをすべて消去した
+}
+
+PAD = 4  # 盤面の下に置く埋まった行の数（下端の判定を省くため）
+CACHE_LIMIT = 20000  # 列挙結果のキャッシュの最大数（超えたら空にする）
+
+# 探索での移動（操作、回転の変化、x の変化、y の変化）
+MOVES = (
+    (ACTION_LEFT, 0, -1, 0),
+    (ACTION_RIGHT, 0, 1, 0),
+    (ACTION_ROTATE_CW, 1, 0, 0),
+    (ACTION_ROTATE_CCW, 3, 0, 0),
+    (ACTION_SOFT_DROP, 0, 0, 1),
+)
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def shifted_masks(width):
+    # (種類, 回転, x) -> x だけずらした行マスク（壁からはみ出す位置は含めない）
+    full = (1 << width) - 1
+    table = {}
+    for piece_type in PIECE_TYPES:
+        for rotation, state in enumerate(piece_type.states):
+            for x in range(-3, width):
+                masks = tuple(m << x if x >= 0 else m >> -x for m in state.masks)
+                if x < 0 and any(m & ((1 << -x) - 1) for m in state.masks):
+                    continue
+                if any(m > full for m in masks):
+                    continue
+                table[piece_type.kind, rotation, x] = masks
+    return table
+
+
+def read_rows(grid, width):
+    # 盤面のセルの値の bytearray を (行マスク, 初期ブロック（爆弾を含む）の行マスク) のタプルに変換
+    # 行マスクの下には埋まった行を PAD 行つける
+    rows = []
+    initial = []
+    for start in range(0, len(grid), width):
+        mask = 0
+        init = 0
+        for x, cell in enumerate(grid[start:start + width]):
+            if cell:
+                mask |= 1 << x
+                if cell == CELL_INITIAL or cell == CELL_BOMB:
+                    init |= 1 << x
+        rows.append(mask)
+        initial.append(init)
+    full_mask = (1 << width) - 1
+    return tuple(rows) + (full_mask,) * PAD, tuple(initial)
+
+
+class Placement:
+    # 1つの固定位置と、固定して行を消去した後の盤面
+    __slots__ = ('kind', 'rotation', 'x', 'y', 'rows', 'initial', 'lines', 'initial_cleared')
+
+    def __init__(self, kind, rotation, x, y, rows, initial, lines, initial_cleared):
+        self.kind = kind
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+        self.rows = rows
+        self.initial = initial
+        self.lines = lines
+        self.initial_cleared = initial_cleared
+
+
+class Node:
+    # ビームサーチの1つの状態
+    __slots__ = ('rows', 'initial', 'current', 'hold', 'queue_index', 'reward', 'value', 'first')
+
+    def __init__(self, rows, initial, current, hold, queue_index, reward, value, first):
+        self.rows = rows
+        self.initial = initial
+        self.current = current  # (種類, 回転)
+        self.hold = hold        # (種類, 回転) または None
+        self.queue_index = queue_index
+        self.reward = reward    # ここまでに消去した行・初期ブロックの評価の合計
+        self.value = value      # reward + 盤面の評価
+        self.first = first      # 1手目 (ホールドするか, Placement)
+
+
+class Bot:
+    def __init__(self, width=10, height=20, depth=3, beam_width=8, weights=None):
+        # depth: 何個先のテトリミノまで読むか（1 で現在のテトリミノのみ）
+        # beam_width: ビームサーチで各段に残す状態の数
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.beam_width = beam_width
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.full_mask = (1 << width) - 1
+        self.masks = shifted_masks(width)
+        self.tallest = [max(state.height for state in piece_type.states) for piece_type in PIECE_TYPES]
+        self.cache = {}
+        self.cache_hits = 0
+        self.evaluated = 0       # 評価した固定位置の数
+        self.search_time = 0.0   # 判断にかかった時間の合計
+        # 実行中の計画
+        self.plan = deque()
+        self.target = None       # 固定する位置 (回転, x, y)
+        self.expected = None     # 次の操作の前にあるはずのテトリミノ
+        self.queue = None        # 計画を立てたときの next_pieces（新しいゲームの判定用）
+        self.piece_count = -1    # 計画を立てたときの next_pieces.count
+        self.holding = False     # ホールドした直後
+
+    # ---- 盤面 ----
+
+    def read_board(self, game):
+        return read_rows(game.grid, game.width)
+
+    def fits(self, rows, kind, rotation, x, y):
+        masks = self.masks.get((kind, rotation, x))
+        if masks is None:
+            return False
+        for i, m in enumerate(masks):
+            if rows[y + i] & m:
+                return False
+        return True
+
+    def search(self, rows, kind, rotation, x, y, parents=None):
+        # (rotation, x, y) から到達できる固定位置を列挙する
+        # parents に辞書を渡すと、各状態への (前の状態, 操作) を記録する（操作の手順の復元用）
+        # 手順が不要な場合は、積まれたブロックより上の区間を1手で落とす（壁以外に当たらないため）
+        table = self.masks
+        if not self.fits(rows, kind, rotation, x, y):
+            return []
+        start = (rotation, x, y)
+        seen = {start}
+        queue = deque([start])
+        if parents is None:
+            top = 0
+            while not rows[top]:
+                top += 1
+            states = PIECE_TYPES[kind].states
+            if y + self.tallest[kind] <= top:
+                # 上空で届く (回転, x) を壁だけを見て求め、それぞれブロックのすぐ上まで落とした位置から探索する
+                sky = {(rotation, x)}
+                stack = [(rotation, x)]
+                while stack:
+                    r, sx = stack.pop()
+                    for nxt in ((r, sx - 1), (r, sx + 1), ((r + 1) % 4, sx), ((r + 3) % 4, sx)):
+                        if nxt not in sky and (kind, nxt[0], nxt[1]) in table:
+                            sky.add(nxt)
+                            stack.append(nxt)
+                seen = set()
+                for r, sx in sky:
+                    seen.add((r, sx, max(y, top - states[r].height)))
+                queue = deque(seen)
+        finals = []
+        while queue:
+            state = queue.popleft()
+            r, sx, sy = state
+            masks = table[kind, r, sx]
+            i = sy + 1
+            for m in masks:
+                if rows[i] & m:
+                    finals.append(state)
+                    break
+                i += 1
+            for action, dr, dx, dy in MOVES:
+                nr = (r + dr) % 4
+                nx = sx + dx
+                ny = sy + dy
+                nxt = (nr, nx, ny)
+                if nxt in seen:
+                    continue
+                masks = table.get((kind, nr, nx))
+                if masks is None:
+                    continue
+                i = ny
+                for m in masks:
+                    if rows[i] & m:
+                        break
+                    i += 1
+                else:
+                    seen.add(nxt)
+                    queue.append(nxt)
+                    if parents is not None:
+                        parents[nxt] = (state, action)
+        return finals
+
+    def lock(self, rows, initial, kind, rotation, x, y):
+        # 固定して行を消去した Placement を返す
+        height = self.height
+        masks = self.masks[kind, rotation, x]
+        new_rows = list(rows[:height])
+        for i, m in enumerate(masks):
+            new_rows[y + i] |= m
+        full = [r for r in range(y, y + len(masks)) if new_rows[r] == self.full_mask]
+        new_initial = initial
+        initial_cleared = 0
+        if full:
+            initial_cleared = sum(popcount(initial[r]) for r in full)
+            keep = [r for r in range(height) if r not in full]
+            new_rows = [0] * len(full) + [new_rows[r] for r in keep]
+            new_initial = (0,) * len(full) + tuple(initial[r] for r in keep)
+        return Placement(kind, rotation, x, y, tuple(new_rows) + (self.full_mask,) * PAD, new_initial,
+                         len(full), initial_cleared)
+
+    def placements(self, rows, initial, kind, rotation, x=None, y=0):
+        # (x, y)（省略時は出現位置）から到達できる固定位置の一覧
+        # 固定後の盤面が同じものは1つにまとめる
+        if x is None:
+            x = PIECE_TYPES[kind].states[rotation].spawn_x(self.width)
+        key = (rows, initial, kind, rotation, x, y)
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache_hits += 1
+            return result
+        result = []
+        seen = set()
+        for r, px, py in self.search(rows, kind, rotation, x, y):
+            placement = self.lock(rows, initial, kind, r, px, py)
+            if placement.rows in seen:
+                continue
+            seen.add(placement.rows)
+            result.append(placement)
+        self.evaluated += len(result)
+        if len(self.cache) >= CACHE_LIMIT:
+            self.cache.clear()
+        self.cache[key] = result
+        return result
+
+    def evaluate(self, rows, initial):
+        # 盤面の評価（高さ・穴・凸凹と、初期ブロックが残っている行の埋まり具合）
+        height = self.height
+        width = self.width
+        heights = [0] * width
+        covered = 0
+        holes = 0
+        initial_holes = 0
+        initial_gaps = 0
+        for y in range(height):
+            row = rows[y]
+            new = row & ~covered
+            while new:
+                low = new & -new
+                heights[low.bit_length() - 1] = height - y
+                new ^= low
+            covered |= row
+            row_holes = popcount(covered & ~row)
+            holes += row_holes
+            if initial[y]:
+                initial_holes += row_holes
+                initial_gaps += width - popcount(row)
+        bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+        w = self.weights
+        return (w['height'] * sum(heights) + w['holes'] * holes + w['bumpiness'] * bumpiness +
+                w['initial_holes'] * initial_holes + w['initial_gaps'] * initial_gaps)
+
+    # ---- 判断 ----
+
+    def choose(self, game):
+        # 次に置く場所を選び、(ホールドするか, Placement) を返す（置けなければ None）
+        start = time.perf_counter()
+        rows, initial = self.read_board(game)
+        piece = game.current_piece
+        hold = game.hold_piece
+        queue = list(game.next_pieces)
+        w = self.weights
+        blocks_left = game.initial_blocks_count
+        root = Node(rows, initial, (piece.kind, piece.rotation),
+                    None if hold is None else (hold.kind, hold.rotation), 0, 0.0, 0.0, None)
+        # 現在のテトリミノは今の位置から、それ以外は出現位置から探索する
+        position = (piece.x, piece.y)
+        beam = [(root, game.can_hold, blocks_left)]
+        best = None
+        for depth in range(min(self.depth, len(queue) + 1)):
+            children = []
+            for node, can_hold, left in beam:
+                options = [(node.current, node.hold, node.queue_index, False)]
+                if can_hold:
+                    if node.hold is None:
+                        if node.queue_index < len(queue):
+                            options.append(((queue[node.queue_index], 0), node.current, node.queue_index + 1, True))
+                    else:
+                        options.append((node.hold, node.current, node.queue_index, True))
+                for (kind, rotation), new_hold, qi, held in options:
+                    x, y = position if node is root and not held else (None, 0)
+                    for p in self.placements(node.rows, node.initial, kind, rotation, x, y):
+                        remaining = left - p.initial_cleared
+                        reward = node.reward + w['lines'] * p.lines + w['initial'] * p.initial_cleared
+                        if remaining <= 0:
+                            reward += w['win']
+                        value = reward + self.evaluate(p.rows, p.initial)
+                        current = (queue[qi], 0) if qi < len(queue) else None
+                        child = Node(p.rows, p.initial, current, new_hold, qi + 1, reward, value,
+                                     node.first or (held, p))
+                        children.append((child, True, remaining))
+            if not children:
+                break
+            children.sort(key=lambda item: item[0].value, reverse=True)
+            best = children[0][0]
+            if children[0][2] <= 0:
+                # 勝てる手が見つかったらそれ以上読まない
+                break
+            # 次のテトリミノがない状態はそれ以上読まない
+            beam = [item for item in children[:self.beam_width] if item[0].current is not None]
+            if not beam:
+                break
+        self.search_time += time.perf_counter() - start
+        return best.first if best is not None else None
+
+    def path(self, game, target):
+        # 現在のテトリミノを target (回転, x, y) まで動かして固定する操作の列（届かなければ None）
+        rows, _ = self.read_board(game)
+        piece = game.current_piece
+        parents = {}
+        finals = self.search(rows, piece.kind, piece.rotation, piece.x, piece.y, parents)
+        if target not in finals:
+            return None
+        actions = []
+        state = target
+        while state in parents:
+            state, action = parents[state]
+            actions.append(action)
+        actions.reverse()
+        # 最後に続くソフトドロップはハードドロップ1回にまとめる
+        while actions and actions[-1] == ACTION_SOFT_DROP:
+            actions.pop()
+        actions.append(ACTION_HARD_DROP)
+        return actions
+
+    def next_action(self, game):
+        # 次の操作を1つ返す（新しいテトリミノが出たら置き場所を決め直す）
+        piece = game.current_piece
+        if self.holding:
+            # ホールドで次のテトリミノを取り出した場合も同じ置き場所のまま進める
+            self.holding = False
+            self.piece_count = game.next_pieces.count
+        queue = game.next_pieces
+        if queue is not self.queue or queue.count != self.piece_count or self.target is None:
+            self.queue = queue
+            self.piece_count = queue.count
+            self.expected = None
+            choice = self.choose(game)
+            if choice is None:
+                return ACTION_HARD_DROP
+            held, p = choice
+            self.target = (p.rotation, p.x, p.y)
+            if held:
+                # 手順はホールドした後のテトリミノで立てる
+                self.holding = True
+                return ACTION_HOLD
+        if self.expected != piece.key():
+            # 自然落下などで計画とずれたら、同じ置き場所への手順を立て直す
+            actions = self.path(game, self.target)
+            if actions is None:
+                self.target = None
+                return ACTION_HARD_DROP
+            self.plan = deque(actions)
+        return self.pop(game)
+
+    def pop(self, game):
+        action = self.plan.popleft()
+        piece = game.current_piece
+        # この操作の後にあるはずのテトリミノ
+        if action == ACTION_LEFT:
+            self.expected = piece.moved(-1, 0).key()
+        elif action == ACTION_RIGHT:
+            self.expected = piece.moved(1, 0).key()
+        elif action == ACTION_ROTATE_CW:
+            self.expected = piece.rotated(True).key()
+        elif action == ACTION_ROTATE_CCW:
+            self.expected = piece.rotated(False).key()
+        elif action == ACTION_SOFT_DROP:
+            self.expected = piece.moved(0, 1).key()
+        else:
+            self.expected = None
+        if action == ACTION_HARD_DROP:
+            self.target = None
+        return action
+
+    def policy(self, game, rng=None):
+        # run_headless の policy として使う
+        return self.next_action(game)
+
+    def stats(self):
+        return {
+            'evaluated': self.evaluated,
+            'search_time': self.search_time,
+            'placements_per_sec': self.evaluated / self.search_time if self.search_time > 0 else 0,
+            'cache_hits': self.cache_hits,
+        }
@@ -0,0 +1,128 @@
+# ゲーム中の出来事を記録するイベントログ（pygame に依存しない）
+# イベントは事前に確保したリングバッファに (時刻, 種類, 値) として書き込み、
+# 出力先（sink）には flush() でまとめて書き出す
+# 無効 ('off') のときは何もしない NULL_LOG を使うので、記録のコストはほぼかからない
+import json
+import sys
+import time
+
+# イベントの種類
+EVENT_LOCK = 0                  # テトリミノが固定された（値は (種類, 回転, x, y)）
+EVENT_ROWS_CLEARED = 1          # 行を消去した（値は行数）
+EVENT_WIN = 2
+EVENT_GAME_OVER = 3
+EVENT_INITIAL_BLOCKS_LEFT = 4   # 残りの初期ブロック数（値は個数）
+EVENT_INITIAL_BLOCK_CLEARED = 5  # 初期ブロックを1つ消去した（値は (行, 列)、デバッグモードのみ）
+EVENT_BOMB = 6                  # 爆弾が爆発した（値は爆発した爆弾の行のタプル、消去する前の位置）
+EVENT_COUNT_MISMATCH = 7        # 初期ブロック数の不一致（値は (カウント, 実際)）
+
+EVENT_NAMES = {
+    EVENT_LOCK: 'piece_locked',
+    EVENT_ROWS_CLEARED: 'rows_cleared',
+    EVENT_WIN: 'win',
+    EVENT_GAME_OVER: 'game_over',
+    EVENT_INITIAL_BLOCKS_LEFT: 'initial_blocks_left',
+    EVENT_INITIAL_BLOCK_CLEARED: 'initial_block_cleared',
+    EVENT_BOMB: 'bomb',
+    EVENT_COUNT_MISMATCH: 'count_mismatch',
+}
+
+SINKS = ('off', 'memory', 'jsonl', 'stderr')
+
+
+class NullEventLog:
+    # 記録しない（既定）
+    enabled = False
+
+    def emit(self, event_type, value=None):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def events(self):
+        return []
+
+
+NULL_LOG = NullEventLog()
+
+
+class EventLog:
+    # sink: 'memory'（バッファに保持するだけ）、'jsonl'（ファイルに1行1イベントの JSON）、'stderr'
+    enabled = True
+
+    def __init__(self, sink='memory', path=None, capacity=4096):
+        self.sink = sink
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.types = [0] * capacity
+        self.values = [None] * capacity
+        self.head = 0      # 次に書き込む位置
+        self.size = 0      # バッファ内のイベント数
+        self.pending = 0   # まだ sink に書き出していないイベント数
+        self.dropped = 0   # 上書きされて失われたイベント数（memory のみ）
+        if sink == 'jsonl':
+            self.stream = open(path, 'a', encoding='utf-8')
+        elif sink == 'stderr':
+            self.stream = sys.stderr
+        else:
+            self.stream = None
+
+    def emit(self, event_type, value=None):
+        i = self.head
+        self.times[i] = time.perf_counter()
+        self.types[i] = event_type
+        self.values[i] = value
+        self.head = (i + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.dropped += 1
+        if self.stream is not None:
+            self.pending += 1
+            if self.pending == self.capacity:
+                self.flush()
+
+    def events(self):
+        # バッファ内のイベントを古い順に (時刻, 種類名, 値) で返す
+        start = (self.head - self.size) % self.capacity
+        result = []
+        for k in range(self.size):
+            i = (start + k) % self.capacity
+            result.append((self.times[i], EVENT_NAMES[self.types[i]], self.values[i]))
+        return result
+
+    def flush(self):
+        # まだ書き出していないイベントを sink に書き出す
+        if self.stream is None or not self.pending:
+            return
+        start = (self.head - self.pending) % self.capacity
+        lines = []
+        for k in range(self.pending):
+            i = (start + k) % self.capacity
+            name = EVENT_NAMES[self.types[i]]
+            if self.sink == 'jsonl':
+                lines.append(json.dumps({'t': round(self.times[i], 6), 'event': name, 'value': self.values[i]}))
+            else:
+                lines.append(f"[{self.times[i]:.3f}] {name} {self.values[i] if self.values[i] is not None else ''}")
+        self.stream.write('\n'.join(lines) + '\n')
+        self.stream.flush()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        if self.sink == 'jsonl':
+            self.stream.close()
+
+
+def make_event_log(sink='off', path=None, capacity=4096):
+    if sink not in SINKS:
+        raise ValueError(f"不明な出力先: {sink}")
+    if sink == 'off':
+        return NULL_LOG
+    if sink == 'jsonl' and path is None:
+        raise ValueError("jsonl にはファイルのパスが必要です")
+    return EventLog(sink, path, capacity)
@@ -0,0 +1,51 @@
+# 固定時間刻みのゲームループ（pygame に依存しない）
+# 描画のフレーム時間をアキュムレータに貯め、決まった長さのシミュレーションステップに分けて進める
+# 描画が遅れても1ステップの長さは変わらないので、ゲームの進み方は描画速度に左右されない
+
+SIM_HZ = 60  # 1秒あたりのシミュレーションステップ数
+
+
+class FixedTimestep:
+    def __init__(self, step_time=1 / SIM_HZ, max_steps=15):
+        self.step_time = step_time
+        # 1フレームで進める最大ステップ数（長く止まった後に追いつこうとして固まるのを防ぐ）
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.total_steps = 0
+        self.dropped_time = 0.0  # 上限を超えて捨てた時間（秒、これまでの合計）
+
+    def reset(self):
+        # ゲーム開始時に呼ぶ（total_steps はリプレイの時刻に使うので0に戻す）
+        self.accumulator = 0.0
+        self.total_steps = 0
+
+    def advance(self, elapsed):
+        # 経過時間を加え、このフレームで進めるステップ数を返す（端数は次のフレームに持ち越す）
+        self.accumulator += elapsed
+        steps = int(self.accumulator / self.step_time)
+        if steps > self.max_steps:
+            self.dropped_time += self.accumulator - self.max_steps * self.step_time
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step_time
+        self.total_steps += steps
+        return steps
+
+
+class GravityTimer:
+    # 自然落下をステップ数で数える（秒で数えると端数が失われて落下速度がずれる）
+    def __init__(self, fall_speed, sim_hz=SIM_HZ):
+        self.interval = max(1, round(fall_speed * sim_hz))
+        self.count = 0
+
+    def reset(self):
+        self.count = 0
+
+    def tick(self):
+        # 1ステップ進め、落下させるタイミングなら True を返す
+        self.count += 1
+        if self.count >= self.interval:
+            self.count = 0
+            return True
+        return False
@@ -0,0 +1,89 @@
+# キー入力の時刻付きキューと長押しの自動リピート（pygame に依存しない）
+# キーが押された・離された時刻を受け取り、シミュレーションのステップの境目の時刻までに起きた操作を
+# 時刻順に取り出す。左右移動は押し続けると DAS（最初のリピートまでの時間）の後に
+# ARR（リピートの間隔）ごとに繰り返し、ソフトドロップは押している間 soft_drop_interval ごとに繰り返す
+# 時刻の単位は秒（time.perf_counter() と同じ）
+from collections import deque
+
+from tetris_core import ACTION_LEFT, ACTION_RIGHT, ACTION_SOFT_DROP
+
+SHIFT_ACTIONS = (ACTION_LEFT, ACTION_RIGHT)
+
+
+class KeyInput:
+    # das, arr, soft_drop_interval は秒。arr=0 は DAS の後に壁まで一気に動かす（instant_repeat 回移動）
+    def __init__(self, das=0.167, arr=0.033, soft_drop_interval=0.05, instant_repeat=10):
+        self.das = das
+        self.arr = arr
+        self.soft_drop_interval = soft_drop_interval
+        self.instant_repeat = instant_repeat
+        self.reset()
+
+    def reset(self):
+        # 押されているキーと取り出していない操作をすべて捨てる（ゲーム開始時など）
+        self.pending = deque()  # 取り出していない (時刻, 操作)（時刻順）
+        self.held = []  # 押されている左右のキー（押した順）
+        self.shift = None  # リピート中の左右の操作
+        self.shift_next = None  # 次にリピートする時刻
+        self.soft_drop_next = None
+        self.repeated = 0.0  # リピートを作り終えた時刻
+
+    def press(self, action, time):
+        self.repeat_until(time)
+        self.pending.append((time, action))
+        if action in SHIFT_ACTIONS:
+            if action not in self.held:
+                self.held.append(action)
+            # 後から押した向きを優先する
+            self.shift = action
+            self.shift_next = time + self.das
+        elif action == ACTION_SOFT_DROP and self.soft_drop_interval > 0:  # 0 はリピートしない
+            self.soft_drop_next = time + self.soft_drop_interval
+
+    def release(self, action, time):
+        self.repeat_until(time)
+        if action in SHIFT_ACTIONS:
+            if action in self.held:
+                self.held.remove(action)
+            if action == self.shift:
+                # 反対の向きがまだ押されていれば、そちらを改めて DAS から始める
+                if self.held:
+                    self.shift = self.held[-1]
+                    self.shift_next = time + self.das
+                else:
+                    self.shift = None
+                    self.shift_next = None
+        elif action == ACTION_SOFT_DROP:
+            self.soft_drop_next = None
+
+    def repeat_until(self, time):
+        # time までのリピートの操作を pending に時刻順に加える
+        if time <= self.repeated:
+            return
+        pending = self.pending
+        while True:
+            shift_next = self.shift_next
+            soft_drop_next = self.soft_drop_next
+            if shift_next is not None and shift_next <= time and (
+                    soft_drop_next is None or shift_next <= soft_drop_next):
+                if self.arr > 0:
+                    pending.append((shift_next, self.shift))
+                    self.shift_next = shift_next + self.arr
+                else:
+                    pending.extend([(shift_next, self.shift)] * self.instant_repeat)
+                    self.shift_next = None  # 押し直すまで動かさない
+            elif soft_drop_next is not None and soft_drop_next <= time:
+                pending.append((soft_drop_next, ACTION_SOFT_DROP))
+                self.soft_drop_next = soft_drop_next + self.soft_drop_interval
+            else:
+                break
+        self.repeated = time
+
+    def take(self, time):
+        # time までに起きた操作を (時刻, 操作) のリストで時刻順に返す
+        self.repeat_until(time)
+        pending = self.pending
+        actions = []
+        while pending and pending[0][0] <= time:
+            actions.append(pending.popleft())
+        return actions
@@ -0,0 +1,156 @@
+# 初期配置（レベル）の一括生成とレベルパック（pygame に依存しない）
+# 候補の初期配置を複数のプロセスで作ってソルバーで難しさ（消し切るのに必要なテトリミノの数）を求め、
+# 選んだものをレベルパックに書き出す。ゲームはパックを mmap で開き、reset_game のたびに1つ選ぶ
+# ファイル形式（リトルエンディアン）:
+#   ヘッダ   : b'TBLV', バージョン (u8), 盤面の幅 (u8), 高さ (u8), レベル数 (u32)
+#   レベル   : 行ごとの初期ブロックのビットマスク (u16、下位ビットが左端) × 高さ の繰り返し
+#              （易しい順に並ぶ）
+# 作成: python levels.py build levels.tblv --candidates 2000 --keep 500
+# 確認: python levels.py info levels.tblv
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import time
+
+MAGIC = b'TBLV'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBI')
+MAX_WIDTH = 16  # 1行を u16 に収める
+
+
+def record_struct(height):
+    return struct.Struct(f'<{height}H')
+
+
+def write_pack(path, levels, width=10, height=20):
+    # levels: 行ごとのビットマスクのリストのリスト
+    if width > MAX_WIDTH:
+        raise ValueError(f"盤面の幅は {MAX_WIDTH} まで")
+    record = record_struct(height)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, len(levels)))
+        for rows in levels:
+            f.write(record.pack(*rows))
+
+
+class LevelPack:
+    # レベルパックを mmap で開き、必要なレベルだけを読む
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            self.file.close()
+            raise ValueError("レベルパックではありません")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.width, self.height, self.count = HEADER.unpack_from(self.data, 0)
+        self.record = record_struct(self.height)
+        if (magic != MAGIC or version != VERSION or not self.count or
+                size != HEADER.size + self.count * self.record.size):
+            self.close()
+            raise ValueError("レベルパックではありません")
+
+    def __len__(self):
+        return self.count
+
+    def rows(self, index):
+        # index 番目のレベルの行ごとのビットマスク
+        return self.record.unpack_from(self.data, HEADER.size + index * self.record.size)
+
+    def pick(self, rng):
+        # ゲームの乱数でレベルを1つ選ぶ（同じシードなら同じレベル）
+        return rng.randrange(self.count)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+# ---- 生成 ----
+
+_solver = None  # ワーカープロセスごとのソルバー（生成のときだけ読み込む）
+
+
+def init_worker(max_pieces, node_limit):
+    global _solver
+    from solver import Solver
+    _solver = Solver(max_pieces=max_pieces, node_limit=node_limit)
+
+
+def score_layout(seed):
+    # シードから初期配置を作り、(シード, 行ごとのビットマスク, 必要なテトリミノの数, 下限) を返す
+    from bot import read_rows
+    from tetris_core import Tetris
+    game = Tetris(seed=seed)
+    rows, initial = read_rows(game.grid, game.width)
+    result = _solver.solve(rows, initial)
+    return seed, initial[:game.height], result.pieces, result.lower_bound
+
+
+def generate(candidates=2000, keep=500, seed=None, workers=None, min_pieces=3, max_pieces=30,
+             node_limit=200, progress=None):
+    # 候補を作って難しさを求め、重複と解けないもの・簡単すぎるものを除いて易しい順に keep 個選ぶ
+    # keep 個より多く残った場合は難しさが偏らないように等間隔に選ぶ
+    # 戻り値は [(必要なテトリミノの数, 行ごとのビットマスク), ...]
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(32) for _ in range(candidates)]
+    found = {}
+    with multiprocessing.Pool(workers, init_worker, (max_pieces, node_limit)) as pool:
+        for done, (_, rows, pieces, lower_bound) in enumerate(
+                pool.imap_unordered(score_layout, seeds, chunksize=8), 1):
+            if pieces is not None and lower_bound >= min_pieces and rows not in found:
+                found[rows] = pieces
+            if progress is not None:
+                progress(done, candidates)
+    ranked = sorted((pieces, rows) for rows, pieces in found.items())
+    if len(ranked) > keep:
+        ranked = [ranked[i * len(ranked) // keep] for i in range(keep)]
+    return ranked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tetrimino Break のレベルパック')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='初期配置を生成してレベルパックを作成')
+    build.add_argument('path', help='作成するレベルパック')
+    build.add_argument('--candidates', type=int, default=2000, help='生成する候補の数')
+    build.add_argument('--keep', type=int, default=500, help='レベルパックに入れる数')
+    build.add_argument('--seed', type=int, default=None, help='乱数のシード')
+    build.add_argument('--workers', type=int, default=None, help='プロセス数（省略時は CPU の数）')
+    build.add_argument('--min-pieces', type=int, default=3, help='これより少なく消し切れる配置は除く')
+    build.add_argument('--max-pieces', type=int, default=30, help='これより多く必要な配置は除く')
+    build.add_argument('--nodes', type=int, default=200, help='1配置あたりの探索ノード数の上限')
+    info = commands.add_parser('info', help='レベルパックの内容を表示')
+    info.add_argument('path', help='レベルパック')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        from tetris_core import Tetris
+        game = Tetris(seed=0)
+        start = time.perf_counter()
+
+        def progress(done, total):
+            if done % 100 == 0 or done == total:
+                print(f"\r{done}/{total}", end='', flush=True)
+
+        ranked = generate(args.candidates, args.keep, args.seed, args.workers, args.min_pieces,
+                          args.max_pieces, args.nodes, progress)
+        print()
+        write_pack(args.path, [rows for _, rows in ranked], game.width, game.height)
+        elapsed = time.perf_counter() - start
+        print(f"{len(ranked)} levels from {args.candidates} candidates, {elapsed:.1f}s")
+        if ranked:
+            print(f"pieces: {ranked[0][0]} - {ranked[-1][0]}")
+    else:
+        pack = LevelPack(args.path)
+        blocks = [sum(bin(mask).count('1') for mask in pack.rows(i)) for i in range(len(pack))]
+        print(f"{args.path}: {len(pack)} levels, {pack.width}x{pack.height}, "
+              f"initial blocks {min(blocks)} - {max(blocks)}")
+        pack.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# テトリミノの定義
+# 回転状態はインポート時に一度だけ計算し、変更不可のオブジェクトとして共有する
+from collections import namedtuple
+
+from bitboard import shape_masks
+
+# テトリミノの色
+CYAN = (0, 255, 255)
+YELLOW = (255, 255, 0)
+PURPLE = (255, 0, 255)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+ORANGE = (255, 165, 0)
+
+# テトリミノの形状定義
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[0, 1, 0], [1, 1, 1]],  # T
+    [[0, 1, 1], [1, 1, 0]],  # S
+    [[1, 1, 0], [0, 1, 1]],  # Z
+    [[1, 0, 0], [1, 1, 1]],  # J
+    [[0, 0, 1], [1, 1, 1]]   # L
+]
+
+# テトリミノの色
+SHAPE_COLORS = [CYAN, YELLOW, PURPLE, GREEN, RED, BLUE, ORANGE]
+
+
+class RotationState:
+    # 1つの回転状態（形状・セル座標・行マスク・サイズ）
+    # intern_state ですべてのテトリミノが共有するので、作成後は属性を変更できない
+    __slots__ = ('shape', 'cells', 'masks', 'bottoms', 'width', 'height', 'spawn_offset')
+
+    def __init__(self, shape):
+        init = object.__setattr__
+        init(self, 'shape', shape)
+        init(self, 'cells', tuple((j, i) for i, row in enumerate(shape) for j, cell in enumerate(row) if cell))
+        init(self, 'masks', shape_masks(shape))
+        # 列ごとの一番下のセル（落下位置の計算用）
+        init(self, 'bottoms', tuple((j, max(i for i, row in enumerate(shape) if row[j]))
+                                    for j in range(len(shape[0])) if any(row[j] for row in shape)))
+        init(self, 'width', len(shape[0]))
+        init(self, 'height', len(shape))
+        init(self, 'spawn_offset', self.width // 2)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"RotationState は変更できません: {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"RotationState は変更できません: {name}")
+
+    def spawn_x(self, board_width):
+        # 出現時の x 座標（中央寄せ）
+        return board_width // 2 - self.spawn_offset
+
+    def __repr__(self):
+        return f"RotationState({self.shape!r})"
+
+
+# 同じ形状の回転状態は1つのオブジェクトを共有する
+_STATES = {}
+
+
+def intern_state(shape):
+    # 形状に対応する回転状態を取得（なければ作成して登録）
+    key = tuple(tuple(row) for row in shape)
+    state = _STATES.get(key)
+    if state is None:
+        state = _STATES[key] = RotationState(key)
+    return state
+
+
+def rotate_shape(shape, clockwise=True):
+    # 形状を90度回転
+    if clockwise:
+        return tuple(tuple(shape[j][i] for j in range(len(shape) - 1, -1, -1)) for i in range(len(shape[0])))
+    return tuple(tuple(shape[j][i] for j in range(len(shape))) for i in range(len(shape[0]) - 1, -1, -1))
+
+
+class PieceType:
+    # テトリミノの種類ごとの情報（4つの回転状態は時計回りの順）
+    __slots__ = ('kind', 'color', 'states')
+
+    def __init__(self, kind, shape, color):
+        self.kind = kind
+        self.color = color
+        states = []
+        shape = tuple(tuple(row) for row in shape)
+        for _ in range(4):
+            states.append(intern_state(shape))
+            shape = rotate_shape(shape)
+        self.states = tuple(states)
+
+
+PIECE_TYPES = tuple(PieceType(kind, shape, color) for kind, (shape, color) in enumerate(zip(SHAPES, SHAPE_COLORS)))
+
+# namedtuple の __new__ は Python の関数なので、移動・回転では tuple.__new__ で直接作る
+_new_tuple = tuple.__new__
+
+
+class Piece(namedtuple('Piece', ('kind', 'rotation', 'x', 'y'))):
+    # 盤面上のテトリミノ（種類・回転・位置のみを持つ値オブジェクト）
+    # タプルなので変更できず、比較とハッシュも (kind, rotation, x, y) で決まる
+    # 移動・回転は新しい Piece を返すので、キャッシュや探索の辞書のキーにそのまま使える
+    __slots__ = ()
+
+    @classmethod
+    def spawn(cls, kind, board_width, rotation=0):
+        # 盤面の上端中央に出現させる
+        state = PIECE_TYPES[kind].states[rotation]
+        return cls(kind, rotation, state.spawn_x(board_width), 0)
+
+    @property
+    def state(self):
+        return PIECE_TYPES[self.kind].states[self.rotation]
+
+    @property
+    def shape(self):
+        return PIECE_TYPES[self.kind].states[self.rotation].shape
+
+    @property
+    def color(self):
+        return PIECE_TYPES[self.kind].color
+
+    def moved(self, dx, dy):
+        return _new_tuple(Piece, (self.kind, self.rotation, self.x + dx, self.y + dy))
+
+    def rotated(self, clockwise=True):
+        return _new_tuple(Piece, (self.kind, (self.rotation + (1 if clockwise else -1)) % 4, self.x, self.y))
+
+    def key(self):
+        # ログなどに書き出すための普通のタプル
+        return tuple(self)
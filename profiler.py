@@ -0,0 +1,175 @@
+# フレームごとの処理時間の計測（pygame に依存しない）
+# ループの中で mark(名前) を呼ぶと、前回の mark からの経過時間をその区間の時間として記録する
+# 区間ごとに直近 window フレーム分のヒストグラムを持ち、p50 / p99 / 最大値をすぐに求められる
+# 無効のときは何もしない NULL_PROFILER を使うので、計測のコストはほぼかからない
+import csv
+import json
+import time
+
+BUCKET_MS = 0.1   # ヒストグラムの1区間の幅（ミリ秒）
+BUCKETS = 1000    # 100ms 以上はすべて最後の区間に入れる
+
+FRAME = 'frame'   # フレーム全体の時間
+INPUT_LATENCY = 'input_latency'  # キー入力が届いてから画面に反映されるまでの時間（record で記録）
+DROPPED_TIME = 'dropped_time'  # 止まった後に追いつけずにシミュレーションで捨てた時間（record で記録）
+
+
+class RollingHistogram:
+    # 直近 window 個の値（ミリ秒）のヒストグラム
+    # 古い値はリングバッファから取り出して区間の数を減らす
+    def __init__(self, window=600):
+        self.window = window
+        self.counts = [0] * BUCKETS
+        self.samples = [0.0] * window
+        self.head = 0
+        self.size = 0
+        self.total = 0       # これまでに記録した値の数
+        self.max_all = 0.0   # これまでの最大値
+
+    def add(self, ms):
+        i = self.head
+        if self.size == self.window:
+            self.counts[min(int(self.samples[i] / BUCKET_MS), BUCKETS - 1)] -= 1
+        else:
+            self.size += 1
+        self.samples[i] = ms
+        self.counts[min(int(ms / BUCKET_MS), BUCKETS - 1)] += 1
+        self.head = (i + 1) % self.window
+        self.total += 1
+        if ms > self.max_all:
+            self.max_all = ms
+
+    def percentile(self, p):
+        # p パーセンタイル（区間の上端の値、ミリ秒。最大値は超えない）
+        if not self.size:
+            return 0.0
+        rank = max(1, -(-self.size * p // 100))
+        seen = 0
+        for b, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        return min((b + 1) * BUCKET_MS, self.max())
+
+    def max(self):
+        # 直近 window 個の中の最大値
+        if not self.size:
+            return 0.0
+        return max(self.samples[:self.size])
+
+    def mean(self):
+        if not self.size:
+            return 0.0
+        return sum(self.samples[:self.size]) / self.size
+
+    def summary(self):
+        return {
+            'p50': round(self.percentile(50), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.max(), 3),
+            'mean': round(self.mean(), 3),
+            'max_all': round(self.max_all, 3),
+            'frames': self.total,
+        }
+
+
+class NullProfiler:
+    # 計測しない（既定）
+    enabled = False
+    overlay = False
+
+    def start_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def record(self, name, ms):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class FrameProfiler:
+    # path を指定すると終了時に結果を書き出す（拡張子が .csv なら CSV、それ以外は JSON）
+    # overlay=True で画面にも表示する
+    enabled = True
+
+    def __init__(self, path=None, window=600, overlay=False):
+        self.path = path
+        self.overlay = overlay
+        self.window = window
+        self.phases = {}  # 区間名 -> RollingHistogram（最初に記録した順）
+        self.frame = RollingHistogram(window)
+        self.current = {}  # このフレームの区間ごとの時間（秒）
+        self.frame_start = None
+        self.last = None
+        self.started = time.perf_counter()
+
+    def start_frame(self):
+        now = time.perf_counter()
+        self.frame_start = self.last = now
+
+    def mark(self, phase):
+        # 前回の mark（またはフレームの開始）からの時間を phase の時間に加える
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        self.frame.add((self.last - self.frame_start) * 1000)
+        for phase, seconds in self.current.items():
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = RollingHistogram(self.window)
+            histogram.add(seconds * 1000)
+        self.current.clear()
+        self.frame_start = None
+
+    def record(self, name, ms):
+        # フレームの区間とは別に測った値（ミリ秒）を name の値として1つ記録する
+        histogram = self.phases.get(name)
+        if histogram is None:
+            histogram = self.phases[name] = RollingHistogram(self.window)
+        histogram.add(ms)
+
+    def summary(self):
+        # {区間名: {'p50', 'p99', 'max', ...}}（ミリ秒、区間は記録した順で最初がフレーム全体）
+        result = {FRAME: self.frame.summary()}
+        for phase, histogram in self.phases.items():
+            result[phase] = histogram.summary()
+        return result
+
+    def write(self, path):
+        summary = self.summary()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['phase', 'p50', 'p99', 'max', 'mean', 'max_all', 'frames'])
+                for phase, s in summary.items():
+                    writer.writerow([phase, s['p50'], s['p99'], s['max'], s['mean'], s['max_all'], s['frames']])
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'window': self.window,
+                           'elapsed': round(time.perf_counter() - self.started, 3),
+                           'phases': summary}, f, indent=2)
+
+    def close(self):
+        if self.path:
+            self.write(self.path)
+
+
+def make_profiler(overlay=False, path=None, window=600):
+    # 表示も保存もしない場合は計測しない
+    if not overlay and path is None:
+        return NULL_PROFILER
+    return FrameProfiler(path, window, overlay)
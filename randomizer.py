@@ -0,0 +1,125 @@
+# 次のテトリミノの種類を決める乱数生成器と、NEXT 用のキュー
+# 種類は PIECE_TYPES の番号 (0〜6) で扱う
+from collections import deque
+
+from pieces import PIECE_TYPES
+
+PIECE_KINDS = len(PIECE_TYPES)
+
+
+class UniformRandomizer:
+    # 毎回7種類から等確率で選ぶ
+    def __init__(self, rng):
+        self.rng = rng
+
+    def next_kind(self):
+        return self.rng.randint(0, PIECE_KINDS - 1)
+
+    def get_state(self):
+        # 乱数以外の状態（スナップショット用、変更されない値で返す）
+        return None
+
+    def set_state(self, state):
+        pass
+
+
+class BagRandomizer:
+    # 7種類を1つずつ袋に入れ、空になるまでランダムな順番で取り出す（7-bag）
+    def __init__(self, rng):
+        self.rng = rng
+        self.bag = []
+
+    def next_kind(self):
+        if not self.bag:
+            self.bag = list(range(PIECE_KINDS))
+            self.rng.shuffle(self.bag)
+        return self.bag.pop()
+
+    def get_state(self):
+        return tuple(self.bag)
+
+    def set_state(self, state):
+        self.bag = list(state)
+
+
+class HistoryRandomizer:
+    # 直近に出た種類を避けて選ぶ（最大 rolls 回まで引き直す）
+    def __init__(self, rng, history=4, rolls=4):
+        self.rng = rng
+        self.rolls = rolls
+        # 最初は S と Z を避けるように履歴を埋めておく
+        self.history = deque([4, 3, 4, 3][:history], maxlen=history)
+
+    def next_kind(self):
+        for _ in range(self.rolls):
+            kind = self.rng.randint(0, PIECE_KINDS - 1)
+            if kind not in self.history:
+                break
+        self.history.append(kind)
+        return kind
+
+    def get_state(self):
+        return tuple(self.history)
+
+    def set_state(self, state):
+        self.history.clear()
+        self.history.extend(state)
+
+
+# 名前の順番はリプレイに記録する番号を兼ねるので、追加は末尾に行う
+RANDOMIZERS = {
+    'uniform': UniformRandomizer,
+    'bag': BagRandomizer,
+    'history': HistoryRandomizer,
+}
+RANDOMIZER_NAMES = tuple(RANDOMIZERS)
+
+
+def make_randomizer(name, rng):
+    try:
+        return RANDOMIZERS[name](rng)
+    except KeyError:
+        raise ValueError(f"不明なランダマイザー: {name}") from None
+
+
+class PieceQueue:
+    # 次のテトリミノの種類を固定長のリングバッファで保持する
+    # 取り出すと空いた場所にすぐ次の種類を補充するので、常に length 個先まで見られる
+    def __init__(self, randomizer, length):
+        self.randomizer = randomizer
+        self.length = length
+        self.buffer = [randomizer.next_kind() for _ in range(length)]
+        self.head = 0
+        self.count = 0  # 取り出した回数（表示の更新判定に使う）
+
+    def pop(self):
+        kind = self.buffer[self.head]
+        self.buffer[self.head] = self.randomizer.next_kind()
+        self.head = (self.head + 1) % self.length
+        self.count += 1
+        return kind
+
+    def get_state(self):
+        # (中身, 先頭の位置, 取り出した回数, ランダマイザーの状態) のタプル
+        return (tuple(self.buffer), self.head, self.count, self.randomizer.get_state())
+
+    def set_state(self, state):
+        buffer, self.head, self.count, randomizer_state = state
+        self.buffer[:] = buffer
+        self.length = len(buffer)
+        self.randomizer.set_state(randomizer_state)
+
+    def peek(self, index=0):
+        # index 個先の種類（0 が次に出る種類）をコピーせずに参照
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return self.buffer[(self.head + index) % self.length]
+
+    __getitem__ = peek
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self.buffer[(self.head + i) % self.length]
@@ -0,0 +1,210 @@
+# リプレイの記録と再生（pygame に依存しない）
+# ファイル形式（リトルエンディアン）:
+#   ヘッダ   : b'TBRP', バージョン (u8), シード (u64), 自然落下の間隔 (u16, ステップ数),
+#              ランダマイザーの番号 (u8), レベルパックのレベル番号 (i32、-1 はレベルパックを使わない),
+#              ルールのフラグ (u8、FLAG_BOMBS), 盤面の幅と高さ (u16 × 2)
+#   入力     : (前の入力からのステップ数 (可変長整数), 操作 (u8)) の繰り返し
+#   フッタ   : 総ステップ数 (u32), スコア (u32), 残りの初期ブロック数 (u32),
+#              結果 (u8), 盤面のチェックサム (u32、board_checksum)
+# 時刻はシミュレーションのステップ数なので、再生は描画なしで一気に進められる
+# 検証: python replay.py game1.tbr game2.tbr ...
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+from randomizer import RANDOMIZER_NAMES
+from tetris_core import Tetris, ACTION_TICK, DEFAULT_WIDTH, DEFAULT_HEIGHT
+
+MAGIC = b'TBRP'
+VERSION = 6  # 開発中の形式（5 まで）とは互換性がない
+HEADER = struct.Struct('<4sBQHBiBHH')
+SIZE = struct.Struct('<HH')
+
+FLAG_BOMBS = 1  # 爆弾ブロックあり
+FOOTER = struct.Struct('<IIIBI')
+
+RESULT_NONE = 0  # 途中で終了
+RESULT_GAME_OVER = 1
+RESULT_WIN = 2
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def game_result(game):
+    if game.game_won:
+        return RESULT_WIN
+    if game.game_over:
+        return RESULT_GAME_OVER
+    return RESULT_NONE
+
+
+def board_checksum(game):
+    # 盤面の大きさとセルの値（パレットの番号）から求めるチェックサム（最終状態の比較用）
+    return zlib.crc32(game.grid, zlib.crc32(SIZE.pack(game.width, game.height)))
+
+
+class Replay:
+    def __init__(self, seed, gravity_interval, randomizer='bag', inputs=None, total_steps=0, score=0,
+                 initial_blocks_count=0, result=RESULT_NONE, checksum=0, level=None, bombs=False,
+                 width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+        self.seed = seed
+        self.gravity_interval = gravity_interval
+        self.randomizer = randomizer
+        self.level = level  # レベルパックのレベル番号（None はレベルパックを使わない）
+        self.bombs = bombs
+        self.width = width
+        self.height = height
+        self.inputs = inputs if inputs is not None else []  # (ステップ, 操作) のリスト
+        self.total_steps = total_steps
+        self.score = score
+        self.initial_blocks_count = initial_blocks_count
+        self.result = result
+        self.checksum = checksum
+
+    def to_bytes(self):
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.gravity_interval,
+                                    RANDOMIZER_NAMES.index(self.randomizer),
+                                    -1 if self.level is None else self.level,
+                                    FLAG_BOMBS if self.bombs else 0, self.width, self.height))
+        last = 0
+        for step, action in self.inputs:
+            encode_varint(step - last, out)
+            out.append(action)
+            last = step
+        out += FOOTER.pack(self.total_steps, self.score, self.initial_blocks_count,
+                           self.result, self.checksum)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version = struct.unpack_from('<4sB', data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("リプレイファイルではありません")
+        (_, _, seed, gravity_interval, randomizer_id, level, flags,
+         width, height) = HEADER.unpack_from(data, 0)
+        randomizer = RANDOMIZER_NAMES[randomizer_id]
+        pos = HEADER.size
+        if level < 0:
+            level = None
+        end = len(data) - FOOTER.size
+        inputs = []
+        step = 0
+        while pos < end:
+            delta, pos = decode_varint(data, pos)
+            step += delta
+            inputs.append((step, data[pos]))
+            pos += 1
+        total_steps, score, blocks, result, checksum = FOOTER.unpack_from(data, end)
+        return cls(seed, gravity_interval, randomizer, inputs, total_steps, score, blocks, result, checksum,
+                   level, bool(flags & FLAG_BOMBS), width, height)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    # プレイ中の入力を記録する（step はゲーム開始からのステップ数）
+    def __init__(self, seed, gravity_interval, randomizer='bag', level=None, bombs=False,
+                 width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+        self.replay = Replay(seed, gravity_interval, randomizer, level=level, bombs=bombs,
+                             width=width, height=height)
+
+    def record(self, step, action):
+        self.replay.inputs.append((step, action))
+
+    def finish(self, game, total_steps):
+        # 最終状態を書き込んで Replay を返す
+        replay = self.replay
+        replay.total_steps = total_steps
+        replay.score = game.score
+        replay.initial_blocks_count = game.initial_blocks_count
+        replay.result = game_result(game)
+        replay.checksum = board_checksum(game)
+        return replay
+
+
+def play(replay, game=None, level_pack=None):
+    # リプレイを描画なしで最後まで再生し、ゲームを返す
+    # 入力のない区間は自然落下の回数だけを計算して飛ばす
+    # レベルパックを使ったゲームのリプレイには、記録したときと同じ level_pack が必要
+    if replay.level is not None and level_pack is None:
+        raise ValueError("このリプレイの再生にはレベルパックが必要です")
+    # 盤面の大きさが違う場合は game を使わずに作り直す
+    if game is None or (game.width, game.height) != (replay.width, replay.height):
+        game = Tetris(width=replay.width, height=replay.height)
+    game.randomizer_name = replay.randomizer
+    game.bombs = replay.bombs
+    game.level_pack = level_pack if replay.level is not None else None
+    game.reset_game(replay.seed, replay.level)
+    interval = replay.gravity_interval
+    done = 0  # 進めたステップ数
+    for step, action in replay.inputs:
+        # step までに起きる自然落下を先に適用
+        for _ in range(step // interval - done // interval):
+            game.step(ACTION_TICK)
+        done = step
+        game.step(action)
+    for _ in range(replay.total_steps // interval - done // interval):
+        game.step(ACTION_TICK)
+    return game
+
+
+def verify(replay, game=None, level_pack=None):
+    # 再生結果が記録された最終状態と一致するか確認
+    game = play(replay, game, level_pack)
+    return (game.score == replay.score and
+            game.initial_blocks_count == replay.initial_blocks_count and
+            game_result(game) == replay.result and
+            board_checksum(game) == replay.checksum)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tetrimino Break のリプレイを検証')
+    parser.add_argument('paths', nargs='+', help='リプレイファイル')
+    parser.add_argument('--levels', metavar='PATH', help='リプレイを記録したときのレベルパック')
+    args = parser.parse_args(argv)
+
+    level_pack = None
+    if args.levels:
+        from levels import LevelPack
+        level_pack = LevelPack(args.levels)
+    game = Tetris()
+    failed = 0
+    start = time.perf_counter()
+    for path in args.paths:
+        replay = Replay.load(path)
+        ok = verify(replay, game, level_pack)
+        failed += not ok
+        print(f"{path}: {'OK' if ok else 'NG'} (score {replay.score})")
+    elapsed = time.perf_counter() - start
+    print(f"{len(args.paths)} replays, {failed} failed, {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# ゲームの結果（スコア・勝敗など）とリプレイを SQLite に保存する（pygame に依存しない）
+# 書き込みは専用のスレッドがまとめて行うので、add() はキューに入れるだけで描画のループを止めない
+# スコアの一覧は盤面の大きさ・爆弾の有無ごとの索引を使って上位から読み出す
+# （まだ書き込んでいない結果もメモリ上から一緒に返すので、add() の直後の一覧にも入る）
+# 表示: python score_store.py scores.db [--top 10] [--width 10 --height 20] [--bombs]
+#       python score_store.py scores.db --export ID game.tbr   （保存したリプレイを書き出す）
+import argparse
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from game_loop import SIM_HZ
+from replay import game_result, RESULT_NONE, RESULT_GAME_OVER, RESULT_WIN
+from tetris_core import DEFAULT_WIDTH, DEFAULT_HEIGHT
+
+RESULT_NAMES = {RESULT_NONE: '-', RESULT_GAME_OVER: 'lose', RESULT_WIN: 'win'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,          -- 終了した時刻（UNIX 時間）
+    score INTEGER NOT NULL,
+    result INTEGER NOT NULL,          -- replay.RESULT_*
+    blocks_cleared INTEGER NOT NULL,  -- 消した初期ブロックの数
+    pieces INTEGER NOT NULL,          -- 使ったテトリミノの数
+    duration REAL NOT NULL,           -- プレイ時間（秒、シミュレーションのステップ数から）
+    seed INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    bombs INTEGER NOT NULL,
+    randomizer TEXT NOT NULL,
+    level INTEGER                     -- レベルパックのレベル番号（NULL はレベルパックなし）
+);
+-- 一覧に表示する列も索引に入れて、表を読まずに索引だけで一覧を返す
+CREATE INDEX IF NOT EXISTS games_leaderboard ON games (width, height, bombs, score DESC, played_at,
+                                                       result, blocks_cleared, pieces, duration);
+CREATE TABLE IF NOT EXISTS replays (
+    game_id INTEGER PRIMARY KEY REFERENCES games (id),
+    data BLOB NOT NULL                -- replay.Replay.to_bytes() の内容
+);
+"""
+
+INSERT_GAME = ('INSERT INTO games (played_at, score, result, blocks_cleared, pieces, duration, seed, '
+               'width, height, bombs, randomizer, level) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+LEADERBOARD = ('SELECT id, score, result, blocks_cleared, pieces, duration, played_at FROM games '
+               'WHERE width = ? AND height = ? AND bombs = ? ORDER BY score DESC, played_at LIMIT ?')
+
+
+def connect(path):
+    # WAL にすると書き込み中でも別の接続から読み出せる
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class ScoreStore:
+    # path: SQLite のファイル（別スレッドから別の接続で開くので ':memory:' は使えない）
+    # replays: add() に渡されたリプレイも保存する
+    # batch_size / flush_interval: 1回のトランザクションにまとめる最大件数と、最初の1件から待つ最大時間（秒）
+    def __init__(self, path, replays=False, batch_size=64, flush_interval=1.0):
+        self.path = path
+        self.replays = replays
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.reader = connect(path)  # 読み出し用（呼び出し側のスレッドで使う）
+        self.reader.executescript(SCHEMA)
+        self.queue = queue.Queue()
+        self.pending = {}  # まだ書き込んでいない結果 {番号: 行}
+        self.pending_lock = threading.Lock()
+        self.next_token = 0
+        self.written = 0  # 書き込んだ件数
+        self.failed = 0  # 書き込みに失敗した件数
+        self.thread = threading.Thread(target=self.run, name='score-store', daemon=True)
+        self.thread.start()
+
+    def add(self, game, initial_blocks, steps, replay=None):
+        # 終わったゲームの結果を書き込みのキューに入れる（すぐに戻る）
+        # initial_blocks: 開始時の初期ブロック数、steps: ゲーム開始からのステップ数
+        # replay: replay.Replay（バイト列への変換も書き込み用のスレッドで行う）
+        row = (time.time(), game.score, game_result(game), initial_blocks - game.initial_blocks_count,
+               game.next_pieces.count, steps / SIM_HZ, game.seed, game.width, game.height, int(game.bombs),
+               game.randomizer_name, game.level)
+        token = self.next_token
+        self.next_token += 1
+        with self.pending_lock:
+            self.pending[token] = row
+        self.queue.put((token, row, replay if self.replays else None))
+
+    def run(self):
+        # キューから取り出した結果をまとめて書き込む（None を受け取ると終了）
+        conn = connect(self.path)
+        try:
+            stop = False
+            while not stop:
+                item = self.queue.get()
+                if item is None:
+                    self.queue.task_done()
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                self.write(conn, batch)
+                for _ in range(len(batch) + stop):
+                    self.queue.task_done()
+        finally:
+            conn.close()
+
+    def write(self, conn, batch):
+        # 1回のトランザクションにまとめて書き込む
+        # 失敗したら1件ずつ書き込み直し、書き込めない結果だけを捨てる（スレッドは止めない）
+        try:
+            self.insert(conn, batch)
+            self.written += len(batch)
+        except Exception:
+            for item in batch:
+                try:
+                    self.insert(conn, [item])
+                    self.written += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"score_store: 結果の保存に失敗しました: {e!r}", file=sys.stderr)
+        finally:
+            with self.pending_lock:
+                for token, _, _ in batch:
+                    self.pending.pop(token, None)
+
+    def insert(self, conn, batch):
+        with conn:
+            for _, row, replay in batch:
+                game_id = conn.execute(INSERT_GAME, row).lastrowid
+                if replay is not None:
+                    conn.execute('INSERT INTO replays (game_id, data) VALUES (?, ?)',
+                                 (game_id, replay.to_bytes()))
+
+    def flush(self):
+        # キューに入れた結果がすべて書き込まれるまで待つ
+        self.queue.join()
+
+    def leaderboard(self, limit=10, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, bombs=False):
+        # 同じルールのゲームをスコアの高い順に返す
+        # [(id, スコア, 結果, 消した初期ブロック数, テトリミノ数, プレイ時間, 時刻), ...]
+        # まだ書き込んでいない結果も含める（id は None）。書き込み用のスレッドは書き込んだ後で
+        # pending から除くので、先に pending を写してから読めば、どの結果も漏れない（重なった分は時刻で除く）
+        with self.pending_lock:
+            pending = [(None, row[1], row[2], row[3], row[4], row[5], row[0]) for row in self.pending.values()
+                       if row[7] == width and row[8] == height and row[9] == int(bombs)]
+        entries = self.reader.execute(LEADERBOARD, (width, height, int(bombs), limit)).fetchall()
+        if pending:
+            written = {entry[6] for entry in entries}
+            entries += [entry for entry in pending if entry[6] not in written]
+            entries.sort(key=lambda entry: (-entry[1], entry[6]))
+        return entries[:limit]
+
+    def replay(self, game_id):
+        # 保存したリプレイのバイト列（保存していなければ None）
+        row = self.reader.execute('SELECT data FROM replays WHERE game_id = ?', (game_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def close(self):
+        # 残りを書き込んでからスレッドを終了する
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.reader.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tetrimino Break のスコアの一覧')
+    parser.add_argument('path', help='スコアを保存した SQLite のファイル')
+    parser.add_argument('--top', type=int, default=10, help='表示する件数')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help='盤面の幅')
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help='盤面の高さ')
+    parser.add_argument('--bombs', action='store_true', help='爆弾ブロックありのゲーム')
+    parser.add_argument('--export', nargs=2, metavar=('ID', 'PATH'), help='保存したリプレイをファイルに書き出す')
+    args = parser.parse_args(argv)
+
+    store = ScoreStore(args.path)
+    try:
+        if args.export:
+            data = store.replay(int(args.export[0]))
+            if data is None:
+                print(f"ゲーム {args.export[0]} のリプレイは保存されていません", file=sys.stderr)
+                return 1
+            with open(args.export[1], 'wb') as f:
+                f.write(data)
+            return 0
+        print(f"{'rank':>4} {'id':>6} {'score':>7} {'result':>6} {'blocks':>6} {'pieces':>6} {'time':>7}  date")
+        entries = store.leaderboard(args.top, args.width, args.height, args.bombs)
+        for rank, (game_id, score, result, blocks, pieces, duration, played_at) in enumerate(entries, 1):
+            date = time.strftime('%Y-%m-%d %H:%M', time.localtime(played_at))
+            print(f"{rank:>4} {game_id:>6} {score:>7} {RESULT_NAMES[result]:>6} {blocks:>6} {pieces:>6} "
+                  f"{duration:>6.1f}s  {date}")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,497 @@
+# 観戦・対戦サーバー（asyncio、pygame に依存しない）
+# 1つの対戦のゲームを固定時間刻みで進め、盤面の変化を観戦者と対戦者に TCP で配信する
+# 毎回送るのは変わった行と、テトリミノ・スコアなどが変わったときのその内容だけで、
+# 盤面全体（キーフレーム）は接続したときと、遅いクライアントが配信を取りこぼしたときにだけ送る
+# 配信データは1回分を1つの bytes にまとめて作り、同じオブジェクトを全員の送信キューに入れる
+# プロトコル（リトルエンディアン）:
+#   接続直後にクライアントが役割を1バイト送る: ROLE_WATCH (b'W') / ROLE_PLAY (b'P')
+#   対戦者はその後、操作 (tetris_core の ACTION_*、ACTION_TICK を除く) を1バイトずつ送る
+#   サーバーはフレーム（長さ (u32) + メッセージの並び）を送る
+#   メッセージはすべて 種類 (u8), プレイヤー番号 (u8) で始まる
+#     MSG_WELCOME  : 自分のプレイヤー番号 (i8、観戦者は -1), プレイヤー数 (u8), 盤面の幅と高さ (u16 × 2)
+#     MSG_KEYFRAME : zlib で圧縮した盤面全体の長さ (u32) + データ
+#     MSG_ROWS     : 行数 (u16), (行番号 (u16) + 行のセルの値 (幅バイト)) の繰り返し
+#     MSG_PIECE    : テトリミノの種類 (i8), 回転 (u8), x と y (i16 × 2), ホールドの種類 (i8、なしは -1),
+#                    スコア (u32), 残りの初期ブロック数 (u32), 状態 (u8、STATUS_*),
+#                    NEXT の数 (u8) + 種類 (u8 × 数)
+# 起動: python server.py serve --port 7777 --players 2 --bots 2
+# 観戦: python server.py watch --port 7777
+# 対戦（ランダムな操作の代役）: python server.py play --port 7777
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+
+from game_loop import FixedTimestep, GravityTimer
+from tetris_core import Tetris, ACTIONS, ACTION_TICK, DEFAULT_WIDTH, DEFAULT_HEIGHT
+
+ROLE_WATCH = b'W'
+ROLE_PLAY = b'P'
+
+MSG_WELCOME = 0
+MSG_KEYFRAME = 1
+MSG_ROWS = 2
+MSG_PIECE = 3
+
+STATUS_PLAYING = 0
+STATUS_GAME_OVER = 1
+STATUS_WON = 2
+
+FRAME = struct.Struct('<I')
+MSG_HEADER = struct.Struct('<BB')
+WELCOME = struct.Struct('<BBbBHH')
+KEYFRAME = struct.Struct('<BBI')
+ROWS = struct.Struct('<BBH')
+ROW = struct.Struct('<H')
+PIECE = struct.Struct('<BBbBhhbIIBB')
+
+MAX_FRAME = 1 << 24  # これより長いフレームは壊れたデータとみなす
+
+# 対戦者が送れる操作（自然落下はサーバーが進めるので、ACTION_TICK は受け付けない）
+PLAYER_ACTIONS = tuple(action for action in ACTIONS if action != ACTION_TICK)
+
+
+def game_status(game):
+    if game.game_won:
+        return STATUS_WON
+    if game.game_over:
+        return STATUS_GAME_OVER
+    return STATUS_PLAYING
+
+
+def frame(messages):
+    # メッセージの並びを1つのフレームにまとめる
+    body = b''.join(messages)
+    return FRAME.pack(len(body)) + body
+
+
+class BoardDelta:
+    # 1人分のゲームについて、前回配信した内容との差分のメッセージを作る
+    # 行の比較は盤面が変わったとき（grid_version が進んだとき）だけ行う
+    def __init__(self, player, game):
+        self.player = player
+        self.game = game
+        self.reset()
+
+    def reset(self):
+        # 今の状態を配信済みとみなす（キーフレームを送った後やゲームを始め直したとき）
+        game = self.game
+        width = game.width
+        self.rows = [bytes(game.grid[start:start + width]) for start in range(0, len(game.grid), width)]
+        self.version = game.grid_version
+        self.piece = self.piece_state()
+
+    def piece_state(self):
+        game = self.game
+        piece = game.current_piece
+        hold = game.hold_piece
+        return (piece.kind, piece.rotation, piece.x, piece.y, -1 if hold is None else hold.kind,
+                game.score, game.initial_blocks_count, game_status(game), tuple(game.next_pieces))
+
+    def encode_piece(self, state):
+        kind, rotation, x, y, hold, score, blocks, status, next_kinds = state
+        return (PIECE.pack(MSG_PIECE, self.player, kind, rotation, x, y, hold, score, blocks, status,
+                           len(next_kinds)) + bytes(next_kinds))
+
+    def keyframe(self):
+        # 盤面全体とテトリミノの状態
+        data = zlib.compress(bytes(self.game.grid))
+        return KEYFRAME.pack(MSG_KEYFRAME, self.player, len(data)) + data + self.encode_piece(self.piece_state())
+
+    def update(self, out):
+        # 前回からの差分のメッセージを out に追加し、配信済みの内容を更新する
+        game = self.game
+        if game.grid_version != self.version:
+            self.version = game.grid_version
+            grid = game.grid
+            width = game.width
+            rows = self.rows
+            changed = []
+            for y in range(len(rows)):
+                row = bytes(grid[y * width:(y + 1) * width])
+                if row != rows[y]:
+                    rows[y] = row
+                    changed.append(ROW.pack(y) + row)
+            if changed:
+                out.append(ROWS.pack(MSG_ROWS, self.player, len(changed)))
+                out.extend(changed)
+        state = self.piece_state()
+        if state != self.piece:
+            self.piece = state
+            out.append(self.encode_piece(state))
+
+
+class Subscriber:
+    # 配信先の1接続。送信待ちのフレームをキューに持ち、別のタスクで順に書き込む
+    # 書き込みが追いつかずに送信待ちが max_pending バイトを超えたら、溜まった差分を捨てて
+    # 次の配信でキーフレームを送り直す（遅いクライアントのためにサーバーのメモリが増え続けない）
+    def __init__(self, writer, player=-1, max_pending=1 << 16):
+        self.writer = writer
+        self.player = player  # 操作するプレイヤー番号（観戦者は -1）
+        self.max_pending = max_pending
+        self.queue = deque()
+        self.pending = 0  # 送信待ちのバイト数
+        self.ready = asyncio.Event()
+        self.needs_keyframe = True
+        self.dropped = 0  # 捨てたフレームの数
+        self.closed = False
+
+    def push(self, data):
+        if self.closed or self.needs_keyframe:
+            return
+        if self.pending + len(data) > self.max_pending:
+            self.dropped += len(self.queue) + 1
+            self.queue.clear()
+            self.pending = 0
+            self.needs_keyframe = True
+            return
+        self.queue.append(data)
+        self.pending += len(data)
+        self.ready.set()
+
+    def push_keyframe(self, data):
+        # キーフレームは送信待ちの上限に関係なく入れる
+        # （取りこぼしたときは差分をもう捨ててあるので、キューにあるのは接続直後の MSG_WELCOME だけ）
+        self.queue.append(data)
+        self.pending += len(data)
+        self.needs_keyframe = False
+        self.ready.set()
+
+    async def run(self):
+        # 送信キューのフレームを書き込む（drain で相手の受信に合わせて待つ）
+        writer = self.writer
+        try:
+            while not self.closed:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.queue:
+                    data = self.queue.popleft()
+                    self.pending -= len(data)
+                    writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.closed = True
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+
+class MatchServer:
+    # 1つの対戦を進めて配信する
+    # players: 対戦の人数（全員同じシードで始めるので、初期配置とテトリミノの順番は同じ）
+    # bots: AI が操作するプレイヤーの数（後ろの番号から割り当てる。残りは ROLE_PLAY で接続した人が操作）
+    # 誰かが勝つか全員がゲームオーバーになったら、restart_delay 秒後に新しいシードで始め直す
+    def __init__(self, players=2, bots=0, seed=None, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT,
+                 fall_speed=1.0, bot_speed=10, bombs=False, restart_delay=3.0, max_pending=1 << 16):
+        self.rng = random.Random(seed)
+        self.games = [Tetris(seed=0, width=width, height=height, bombs=bombs) for _ in range(players)]
+        self.deltas = [BoardDelta(i, game) for i, game in enumerate(self.games)]
+        self.inputs = [deque() for _ in range(players)]  # 対戦者から届いた操作
+        self.controllers = [None] * players  # プレイヤーを操作している Subscriber
+        self.bots = [None] * players
+        if bots:
+            from bot import Bot
+            for i in range(players - bots, players):
+                self.bots[i] = Bot(width, height)
+        self.gravity = [GravityTimer(fall_speed) for _ in range(players)]
+        self.bot_timer = GravityTimer(1 / bot_speed)
+        self.restart_delay = restart_delay
+        self.max_pending = max_pending
+        self.subscribers = set()
+        self.timestep = FixedTimestep()
+        self.finished_at = None
+        self.matches = 0
+        self.frames = 0  # 配信したフレームの数
+        self.server = None
+        self.start_match()
+
+    def start_match(self):
+        seed = self.rng.getrandbits(32)
+        for game, delta, inputs, gravity in zip(self.games, self.deltas, self.inputs, self.gravity):
+            game.reset_game(seed)
+            delta.reset()
+            inputs.clear()
+            gravity.reset()
+        self.finished_at = None
+        self.matches += 1
+        for subscriber in self.subscribers:
+            subscriber.needs_keyframe = True
+
+    def finished(self):
+        # 誰かが勝ったか、全員がゲームオーバーになった
+        return (any(game.game_won for game in self.games) or
+                all(game.game_over for game in self.games))
+
+    def step(self):
+        # シミュレーションを1ステップ進める
+        if self.finished_at is not None:
+            return
+        bot_turn = self.bot_timer.tick()
+        for i, game in enumerate(self.games):
+            if self.gravity[i].tick():
+                game.step(ACTION_TICK)
+            inputs = self.inputs[i]
+            while inputs:
+                game.step(inputs.popleft())
+            bot = self.bots[i]
+            if bot is not None and bot_turn and not (game.game_over or game.game_won):
+                game.step(bot.next_action(game))
+        if self.finished():
+            self.finished_at = self.timestep.total_steps
+
+    def publish(self):
+        # 前回からの差分を1つのフレームにして全員に配る（キーフレームが必要な接続には代わりにそれを送る）
+        messages = []
+        for delta in self.deltas:
+            delta.update(messages)
+        data = frame(messages) if messages else None
+        keyframe = None
+        for subscriber in self.subscribers:
+            if subscriber.needs_keyframe:
+                if keyframe is None:
+                    keyframe = frame([delta.keyframe() for delta in self.deltas])
+                subscriber.push_keyframe(keyframe)
+            elif data is not None:
+                subscriber.push(data)
+        if data is not None:
+            self.frames += 1
+
+    def welcome(self, player):
+        game = self.games[0]
+        return frame([WELCOME.pack(MSG_WELCOME, 0, player, len(self.games), game.width, game.height)])
+
+    async def handle(self, reader, writer):
+        # 1接続の処理（役割を受け取り、対戦者なら操作を読み続ける）
+        try:
+            role = await reader.readexactly(1)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        player = -1
+        if role == ROLE_PLAY:
+            for i, controller in enumerate(self.controllers):
+                if controller is None and self.bots[i] is None:
+                    player = i
+                    break
+        # 送信バッファも max_pending で drain が待つようにして、1接続あたりのメモリを抑える
+        writer.transport.set_write_buffer_limits(self.max_pending)
+        subscriber = Subscriber(writer, player, self.max_pending)
+        subscriber.push_keyframe(self.welcome(player))
+        subscriber.needs_keyframe = True  # 盤面は次の配信でキーフレームとして送る
+        if player >= 0:
+            self.controllers[player] = subscriber
+        self.subscribers.add(subscriber)
+        sender = asyncio.create_task(subscriber.run())
+        try:
+            while not subscriber.closed:
+                data = await reader.read(256)
+                if not data:
+                    break
+                if player >= 0 and self.finished_at is None:
+                    self.inputs[player].extend(action for action in data if action in PLAYER_ACTIONS)
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            if player >= 0:
+                self.controllers[player] = None
+            # 送信用のタスクは drain で待っていることがあるので取り消す
+            # （asyncio.wait は取り消しを投げないが、この handle 自体の取り消しはそのまま伝わる）
+            subscriber.close()
+            sender.cancel()
+            writer.close()
+            await asyncio.wait([sender])
+
+    async def run(self, host='127.0.0.1', port=7777):
+        # 接続を受け付けながら、固定時間刻みでゲームを進めて配信する
+        self.server = await asyncio.start_server(self.handle, host, port)
+        loop = asyncio.get_running_loop()
+        timestep = self.timestep
+        last = loop.time()
+        try:
+            while True:
+                await asyncio.sleep(timestep.step_time)
+                now = loop.time()
+                for _ in range(timestep.advance(now - last)):
+                    self.step()
+                last = now
+                self.publish()
+                if (self.finished_at is not None and
+                        timestep.total_steps - self.finished_at >= self.restart_delay / timestep.step_time):
+                    self.start_match()
+        finally:
+            self.server.close()
+            for subscriber in list(self.subscribers):
+                subscriber.close()
+                subscriber.writer.close()
+            await self.server.wait_closed()
+
+
+# ---- クライアント ----
+
+class MatchMirror:
+    # 受け取ったフレームから対戦の状態を組み立て直す（観戦画面や代役のクライアント用）
+    def __init__(self):
+        self.player = -1
+        self.width = 0
+        self.height = 0
+        self.grids = []
+        self.pieces = []  # プレイヤーごとの BoardDelta.piece_state() と同じ形のタプル
+        self.frames = 0
+        self.keyframes = 0
+        self.bytes = 0
+
+    def apply(self, body):
+        # 1フレーム分（長さを除いた部分）を反映する
+        self.frames += 1
+        self.bytes += FRAME.size + len(body)
+        pos = 0
+        while pos < len(body):
+            kind, player = MSG_HEADER.unpack_from(body, pos)
+            if kind == MSG_WELCOME:
+                _, _, self.player, players, self.width, self.height = WELCOME.unpack_from(body, pos)
+                pos += WELCOME.size
+                self.grids = [bytearray(self.width * self.height) for _ in range(players)]
+                self.pieces = [None] * players
+            elif kind == MSG_KEYFRAME:
+                _, _, length = KEYFRAME.unpack_from(body, pos)
+                pos += KEYFRAME.size
+                self.grids[player][:] = zlib.decompress(body[pos:pos + length])
+                pos += length
+                if player == 0:
+                    self.keyframes += 1
+            elif kind == MSG_ROWS:
+                _, _, count = ROWS.unpack_from(body, pos)
+                pos += ROWS.size
+                grid = self.grids[player]
+                width = self.width
+                for _ in range(count):
+                    (y,) = ROW.unpack_from(body, pos)
+                    pos += ROW.size
+                    grid[y * width:(y + 1) * width] = body[pos:pos + width]
+                    pos += width
+            elif kind == MSG_PIECE:
+                (_, _, piece_kind, rotation, x, y, hold, score, blocks, status,
+                 count) = PIECE.unpack_from(body, pos)
+                pos += PIECE.size
+                next_kinds = tuple(body[pos:pos + count])
+                pos += count
+                self.pieces[player] = (piece_kind, rotation, x, y, hold, score, blocks, status, next_kinds)
+            else:
+                raise ValueError(f"不明なメッセージ: {kind}")
+
+
+async def read_frame(reader):
+    # フレームを1つ読み、長さを除いた部分を返す（接続が閉じたら None）
+    try:
+        header = await reader.readexactly(FRAME.size)
+        (length,) = FRAME.unpack(header)
+        if length > MAX_FRAME:
+            raise ValueError("フレームが長すぎます")
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+async def receive(reader, mirror, duration=None):
+    # duration 秒（省略時は切断されるまで）フレームを受信して mirror に反映する
+    loop = asyncio.get_running_loop()
+    deadline = None if duration is None else loop.time() + duration
+    while True:
+        timeout = None if deadline is None else deadline - loop.time()
+        if timeout is not None and timeout <= 0:
+            return
+        try:
+            body = await asyncio.wait_for(read_frame(reader), timeout)
+        except asyncio.TimeoutError:
+            return
+        if body is None:
+            return
+        mirror.apply(body)
+
+
+async def watch(host, port, duration=None):
+    # 観戦者として接続して受信し、MatchMirror を返す
+    mirror = MatchMirror()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(ROLE_WATCH)
+    try:
+        await receive(reader, mirror, duration)
+    finally:
+        writer.close()
+    return mirror
+
+
+async def play(host, port, duration=None, actions_per_sec=10, seed=None):
+    # 対戦者の代役として接続し、ランダムな操作を送りながら受信して MatchMirror を返す
+    mirror = MatchMirror()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(ROLE_PLAY)
+    rng = random.Random(seed)
+
+    async def send():
+        while True:
+            await asyncio.sleep(1 / actions_per_sec)
+            writer.write(bytes((rng.choice(PLAYER_ACTIONS),)))
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    try:
+        await receive(reader, mirror, duration)
+    finally:
+        sender.cancel()
+        writer.close()
+    return mirror
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tetrimino Break の観戦・対戦サーバー')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='サーバーを起動')
+    serve.add_argument('--host', default='127.0.0.1', help='待ち受けるアドレス')
+    serve.add_argument('--port', type=int, default=7777, help='待ち受けるポート')
+    serve.add_argument('--players', type=int, default=2, help='対戦の人数')
+    serve.add_argument('--bots', type=int, default=0, help='AI が操作するプレイヤーの数')
+    serve.add_argument('--seed', type=int, default=None, help='乱数のシード')
+    serve.add_argument('--width', type=int, default=DEFAULT_WIDTH, help='盤面の幅（マス数）')
+    serve.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help='盤面の高さ（マス数）')
+    serve.add_argument('--bombs', action='store_true', help='初期ブロックの一部を爆弾ブロックにする')
+    for name, help_text in (('watch', '観戦者として接続して受信量を表示'),
+                            ('play', 'ランダムな操作をする対戦者の代役として接続')):
+        client = commands.add_parser(name, help=help_text)
+        client.add_argument('--host', default='127.0.0.1', help='サーバーのアドレス')
+        client.add_argument('--port', type=int, default=7777, help='サーバーのポート')
+        client.add_argument('--duration', type=float, default=10.0, help='接続している秒数')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        if args.bots > args.players:
+            parser.error("--bots は --players 以下にしてください")
+        server = MatchServer(args.players, args.bots, args.seed, args.width, args.height, bombs=args.bombs)
+        print(f"listening on {args.host}:{args.port}")
+        try:
+            asyncio.run(server.run(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    start = time.perf_counter()
+    if args.command == 'watch':
+        mirror = asyncio.run(watch(args.host, args.port, args.duration))
+    else:
+        mirror = asyncio.run(play(args.host, args.port, args.duration))
+    elapsed = time.perf_counter() - start
+    scores = ' '.join(str(piece[5]) for piece in mirror.pieces if piece is not None)
+    print(f"player {mirror.player}  {mirror.frames} frames ({mirror.keyframes} keyframes)  "
+          f"{mirror.bytes / elapsed:.0f} bytes/sec  scores: {scores}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+# 初期ブロックを消し切るのに必要な最小のテトリミノ数を求めるソルバー（pygame に依存しない）
+# 速さのため、置き場所は真上から落とす位置（回転と列の組み合わせ）に限る
+# （隙間に横から滑り込ませる置き方は考えないので、結果は実際の最小数の上限になる）
+# 初期ブロックは行を消去しないと消えず、その行の空きマスの上にあるブロックも
+# 行ごと消さないと空きマスを埋められない。消す必要のある行の空きマスの数を 4 で割った値が
+# 残りのテトリミノ数の下限になる。まずビームサーチで解を1つ見つけて上限とし、
+# 下限から上限の手前までを反復深化（IDA*）で探索する。同じ局面は Zobrist ハッシュの置換表で二度探索しない
+# 置換表は固定サイズで、衝突したら残りの深さが浅い方（または古い探索の方）を上書きする
+# 探索するノード数に上限があるので、時間内に決まらない場合は最小と確定していない解（または「不明」）を返す
+# 配置の確認: python solver.py --layouts 100 --seed 1
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from bot import Bot, popcount, read_rows, shifted_masks
+from pieces import PIECE_TYPES
+
+PIECE_KINDS = len(PIECE_TYPES)
+FULL_BAG = (1 << PIECE_KINDS) - 1
+
+# pieces: 見つかった解の最小のテトリミノ数（見つからなければ None）
+# proven: pieces が最小であること（None なら max_pieces 個以内では解けないこと）が確定したか
+# lower_bound: 確定している下限、nodes: 探索したノード数、elapsed: かかった時間（秒）
+SolveResult = namedtuple('SolveResult', 'pieces proven lower_bound nodes elapsed')
+
+# 配置の判定結果
+LAYOUT_OK = 'ok'
+LAYOUT_TRIVIAL = 'trivial'        # 少なすぎるテトリミノで消し切れる
+LAYOUT_UNWINNABLE = 'unwinnable'  # max_pieces 個以内では消し切れない
+LAYOUT_UNKNOWN = 'unknown'        # ノード数の上限までに決まらなかった
+
+
+class SearchLimit(Exception):
+    pass
+
+
+class TranspositionTable:
+    # 「この局面から残り depth 個では解けない」を記録する固定サイズの表
+    def __init__(self, bits=16):
+        self.mask = (1 << bits) - 1
+        self.keys = [0] * (1 << bits)
+        self.depths = [0] * (1 << bits)
+        self.generations = [0] * (1 << bits)
+        self.generation = 0  # solve() ごとに進める（古い探索の記録は一致しない）
+
+    def new_search(self):
+        self.generation += 1
+
+    def refuted(self, key, depth):
+        i = key & self.mask
+        return (self.generations[i] == self.generation and self.keys[i] == key and
+                self.depths[i] >= depth)
+
+    def store(self, key, depth):
+        i = key & self.mask
+        if self.generations[i] != self.generation or self.keys[i] == key or self.depths[i] <= depth:
+            self.keys[i] = key
+            self.depths[i] = depth
+            self.generations[i] = self.generation
+
+
+def cells_key(z_cells, mask):
+    # mask のビットが立っているマスの乱数の XOR
+    key = 0
+    while mask:
+        low = mask & -mask
+        key ^= z_cells[low.bit_length() - 1]
+        mask ^= low
+    return key
+
+
+class Solver:
+    def __init__(self, width=10, height=20, max_pieces=30, node_limit=200, table_bits=16, seed=0):
+        # max_pieces: これより多くのテトリミノが必要な配置は解けないとみなす
+        # node_limit: 1回の solve() で探索するノード数の上限
+        self.width = width
+        self.height = height
+        self.max_pieces = max_pieces
+        self.node_limit = node_limit
+        self.full_mask = (1 << width) - 1
+        # 種類ごとの (回転, x, 行マスク, 列ごとの一番下のセル)
+        masks = shifted_masks(width)
+        self.drops = [[(rotation, x, masks[kind, rotation, x], state.bottoms)
+                       for rotation, state in enumerate(PIECE_TYPES[kind].states)
+                       for x in range(-3, width) if (kind, rotation, x) in masks
+                       # 回転しても形が同じものは1つだけ
+                       if state not in PIECE_TYPES[kind].states[:rotation]]
+                      for kind in range(PIECE_KINDS)]
+        self.table = TranspositionTable(table_bits)
+        self.bot = Bot(width, height)  # 上限を求めるビームサーチの盤面の評価に使う
+        # Zobrist ハッシュの乱数（マスごとに1つずつ。行のマスク全通りでは幅が広い盤面で作れない）
+        rng = random.Random(seed)
+        self.z_cells = [[rng.getrandbits(64) for _ in range(width)] for _ in range(height)]
+        self.z_initial = [[rng.getrandbits(64) for _ in range(width)] for _ in range(height)]
+        self.row_keys = [{} for _ in range(height)]  # 行ごとの {マスク: ハッシュ}
+        self.initial_keys = [{} for _ in range(height)]
+        self.z_index = [rng.getrandbits(64) for _ in range(max_pieces + 2)]
+        self.z_hold = [rng.getrandbits(64) for _ in range(PIECE_KINDS + 1)]
+        self.z_bag = [rng.getrandbits(64) for _ in range(FULL_BAG + 1)]
+        self.nodes = 0
+
+    def board_hash(self, rows, initial):
+        # 行ごとのハッシュはマスごとの乱数の XOR で、一度求めた行のマスクの値は覚えておく
+        row_keys = self.row_keys
+        initial_keys = self.initial_keys
+        key = 0
+        for y in range(self.height):
+            row = rows[y]
+            if row:
+                k = row_keys[y].get(row)
+                if k is None:
+                    k = row_keys[y][row] = cells_key(self.z_cells[y], row)
+                key ^= k
+                row = initial[y]
+                if row:
+                    k = initial_keys[y].get(row)
+                    if k is None:
+                        k = initial_keys[y][row] = cells_key(self.z_initial[y], row)
+                    key ^= k
+        return key
+
+    def need(self, rows, initial):
+        # 初期ブロックを消し切るまでに埋める必要のある空きマスの数
+        # 初期ブロックのある行と、消す必要のある行の空きマスの上にブロックがある行は消す必要がある
+        full = self.full_mask
+        width = self.width
+        columns = 0  # 下に埋める必要のある空きマスがある列
+        total = 0
+        for y in range(self.height - 1, -1, -1):
+            row = rows[y]
+            if initial[y] or row & columns:
+                total += width - bin(row).count('1')
+                columns |= full & ~row
+        return total
+
+    def expand_drops(self, rows, initial, kind):
+        # kind を真上から落とせるすべての位置に置き、(固定後の行マスク, 初期ブロックの行マスク) を返す
+        height = self.height
+        full = self.full_mask
+        # 列ごとの一番上のブロックの行
+        tops = [height] * self.width
+        remaining = full
+        for y in range(height):
+            found = rows[y] & remaining
+            while found:
+                low = found & -found
+                tops[low.bit_length() - 1] = y
+                found ^= low
+            remaining &= ~rows[y]
+            if not remaining:
+                break
+        result = []
+        for rotation, x, masks, bottoms in self.drops[kind]:
+            y = min(tops[x + dx] - bottom for dx, bottom in bottoms) - 1
+            if y < 0:
+                continue
+            new_rows = list(rows[:height])
+            cleared = False
+            for i, m in enumerate(masks):
+                new_rows[y + i] |= m
+                if new_rows[y + i] == full:
+                    cleared = True
+            new_initial = initial
+            if cleared:
+                keep = [r for r in range(height) if new_rows[r] != full]
+                empty = height - len(keep)
+                new_initial = (0,) * empty + tuple(initial[r] for r in keep)
+                new_rows = [0] * empty + [new_rows[r] for r in keep]
+            result.append((tuple(new_rows) + rows[height:], new_initial))
+        return result
+
+    def solve(self, rows, initial, sequence=None, hold=True, beam_width=4):
+        # rows, initial: 行マスクのタプル（bot.read_rows で作成）
+        # sequence: テトリミノの種類の並び。None なら 7-bag のルールで好きな順番に選べるものとする
+        # hold: sequence を使う場合にホールドを使えるか
+        # まずビームサーチで解を1つ見つけて上限とし、下限から上限の手前まで反復深化で最小を探す
+        start = time.perf_counter()
+        self.nodes = 0
+        self.table.new_search()
+        self.sequence = sequence
+        self.hold = hold
+        max_pieces = self.max_pieces if sequence is None else min(self.max_pieces, len(sequence))
+        if not any(initial):
+            return SolveResult(0, True, 0, 0, time.perf_counter() - start)
+        root = FULL_BAG if sequence is None else (0, None)
+        lower = max(1, -(-self.need(rows, initial) // 4))
+        upper = self.beam(rows, initial, root, max_pieces, beam_width)
+        best = upper
+        depth = lower
+        try:
+            while depth <= max_pieces and (upper is None or depth < upper):
+                if self.search(rows, initial, root, depth):
+                    best = depth
+                    break
+                depth += 1
+        except SearchLimit:
+            return SolveResult(best, False, depth, self.nodes, time.perf_counter() - start)
+        return SolveResult(best, True, best if best is not None else depth, self.nodes,
+                           time.perf_counter() - start)
+
+    def options(self, state):
+        # 次に置けるテトリミノの (種類, 置いた後の状態) の一覧
+        # 状態は 7-bag なら袋に残っている種類のマスク、並びを使う場合は (位置, ホールドしている種類)
+        sequence = self.sequence
+        if sequence is None:
+            return [(kind, state & ~(1 << kind) or FULL_BAG)
+                    for kind in range(PIECE_KINDS) if state & (1 << kind)]
+        index, held = state
+        result = []
+        if index < len(sequence):
+            result.append((sequence[index], (index + 1, held)))
+        if self.hold:
+            if held is None:
+                if index + 1 < len(sequence):
+                    result.append((sequence[index + 1], (index + 2, sequence[index])))
+            elif index < len(sequence):
+                result.append((held, (index + 1, sequence[index])))
+        return result
+
+    def state_hash(self, state):
+        if self.sequence is None:
+            return self.z_bag[state]
+        index, held = state
+        return self.z_index[index] ^ self.z_hold[PIECE_KINDS if held is None else held]
+
+    def beam(self, rows, initial, root, max_pieces, width):
+        # AI と同じ評価で良い局面を width 個ずつ残して進め、消し切れた個数を返す（上限）
+        evaluate = self.bot.evaluate
+        weight = self.bot.weights['initial']
+        beam = [(0.0, rows, initial, root)]
+        for pieces in range(1, max_pieces + 1):
+            children = {}
+            for reward, rows, initial, state in beam:
+                left = sum(map(popcount, initial))
+                for kind, next_state in self.options(state):
+                    for child_rows, child_initial in self.expand_drops(rows, initial, kind):
+                        if not any(child_initial):
+                            return pieces
+                        key = self.board_hash(child_rows, child_initial) ^ self.state_hash(next_state)
+                        if key not in children:
+                            child_reward = reward
+                            if child_initial is not initial:
+                                # 行を消去したときだけ数え直す
+                                child_reward += weight * (left - sum(map(popcount, child_initial)))
+                            children[key] = (child_reward + evaluate(child_rows, child_initial),
+                                             child_reward, child_rows, child_initial, next_state)
+            if not children:
+                return None
+            best = sorted(children.values(), key=lambda item: item[0], reverse=True)[:width]
+            beam = [item[1:] for item in best]
+        return None
+
+    def expand(self, rows, initial, kind, depth):
+        # 残り depth 個で間に合う子だけを、埋める必要のあるマスが少ない順に返す（消し切れたら None）
+        limit = 4 * (depth - 1)
+        children = []
+        for child_rows, child_initial in self.expand_drops(rows, initial, kind):
+            if not any(child_initial):
+                return [None]
+            need = self.need(child_rows, child_initial)
+            if need <= limit:
+                children.append((need, child_rows, child_initial))
+        children.sort(key=lambda child: child[0])
+        return [(child_rows, child_initial) for _, child_rows, child_initial in children]
+
+    def visit(self):
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise SearchLimit
+
+    def search(self, rows, initial, state, depth):
+        # depth 個以内に初期ブロックを消し切れるか
+        key = self.board_hash(rows, initial) ^ self.state_hash(state)
+        if self.table.refuted(key, depth):
+            return False
+        self.visit()
+        for kind, next_state in self.options(state):
+            for child in self.expand(rows, initial, kind, depth):
+                if child is None:
+                    return True
+                if depth > 1 and self.search(child[0], child[1], next_state, depth - 1):
+                    return True
+        self.table.store(key, depth)
+        return False
+
+    def solve_game(self, game, use_queue=False):
+        # ゲームの現在の盤面を解く（use_queue=True なら現在のテトリミノと NEXT の順番を使う）
+        rows, initial = read_rows(game.grid, game.width)
+        sequence = None
+        if use_queue:
+            sequence = [game.current_piece.kind] + list(game.next_pieces)
+        return self.solve(rows, initial, sequence)
+
+    def classify(self, game, min_pieces=3):
+        # 新しいゲームの初期配置を判定する（LAYOUT_*）
+        result = self.solve_game(game)
+        if result.pieces is not None:
+            return LAYOUT_TRIVIAL if result.pieces < min_pieces else LAYOUT_OK
+        if result.proven:
+            return LAYOUT_UNWINNABLE
+        # 下限が min_pieces 以上なら簡単すぎることはない
+        return LAYOUT_OK if result.lower_bound >= min_pieces else LAYOUT_UNKNOWN
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tetrimino Break の初期配置を解く')
+    parser.add_argument('--layouts', type=int, default=100, help='確認する初期配置の数')
+    parser.add_argument('--seed', type=int, default=None, help='乱数のシード')
+    parser.add_argument('--max-pieces', type=int, default=30, help='これより多く必要な配置は解けないとみなす')
+    parser.add_argument('--nodes', type=int, default=200, help='1配置あたりの探索ノード数の上限')
+    parser.add_argument('--queue', action='store_true', help='7-bag の代わりに実際のテトリミノの順番を使う')
+    args = parser.parse_args(argv)
+
+    from tetris_core import Tetris
+    solver = Solver(max_pieces=args.max_pieces, node_limit=args.nodes)
+    rng = random.Random(args.seed)
+    game = Tetris(seed=0, preview=args.max_pieces)
+    counts = {}
+    solved = 0
+    unknown = 0
+    total_time = 0.0
+    worst = 0.0
+    for _ in range(args.layouts):
+        game.reset_game(rng.getrandbits(32))
+        result = solver.solve_game(game, args.queue)
+        total_time += result.elapsed
+        worst = max(worst, result.elapsed)
+        if result.pieces is not None:
+            solved += 1
+            counts[result.pieces] = counts.get(result.pieces, 0) + 1
+        elif not result.proven:
+            unknown += 1
+    print(f"layouts: {args.layouts}  solved: {solved}  unknown: {unknown}  "
+          f"unwinnable: {args.layouts - solved - unknown}")
+    print("pieces: " + "  ".join(f"{n}: {counts[n]}" for n in sorted(counts)))
+    print(f"average {total_time / max(1, args.layouts) * 1000:.1f} ms  worst {worst * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
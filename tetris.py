@@ -1,49 +1,111 @@
-import pygame
-import random
+# Tetrimino Break の画面つきのゲーム（pygame を使用）
+# pygame は画面を開くときに load_pygame() で初めて読み込むので、このモジュールを import しても
+# --headless / --replay で実行しても SDL は読み込まない
+# 使い方: python tetris.py [--fps 60] [--startup-time] ...（python tetris.py --help）
+import time
+
+STARTED = time.perf_counter()  # 起動時間の計測用（このモジュールを読み込み始めた時刻）
+
+import argparse
+import os
 import sys
-import copy
+from collections import deque
+from functools import lru_cache
+
+from game_loop import FixedTimestep, GravityTimer
+from pieces import RED, GREEN, PIECE_TYPES
+from event_log import SINKS, EVENT_BOMB, make_event_log
+from key_input import KeyInput
+from profiler import NULL_PROFILER, FRAME, INPUT_LATENCY, DROPPED_TIME, make_profiler
+from randomizer import RANDOMIZER_NAMES
+import replay
+import tetris_core
+from tetris_core import (Tetris, INITIAL_BLOCK_COLOR, CELL_EMPTY, CELL_PIECE, PALETTE, ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE_CW,
+                         ACTION_ROTATE_CCW, ACTION_HOLD, ACTION_SOFT_DROP, ACTION_HARD_DROP, ACTION_TICK,
+                         DEFAULT_WIDTH, DEFAULT_HEIGHT)
 
 # 画面サイズとブロックサイズの設定
 SCREEN_WIDTH = 600  # 画面幅をさらに広げる
 SCREEN_HEIGHT = 600
 BLOCK_SIZE = 30
 GAME_AREA_WIDTH = 10 * BLOCK_SIZE  # ゲームエリアの幅
+# ゲームエリアに表示できるマス数。盤面がこれより大きい場合はテトリミノに合わせてスクロールし、
+# 見えている範囲だけを描画する
+VIEW_COLUMNS = GAME_AREA_WIDTH // BLOCK_SIZE
+VIEW_ROWS = SCREEN_HEIGHT // BLOCK_SIZE
+SCROLL_MARGIN = 2  # スクロールするときにテトリミノと落下位置の外側に見せておくマス数
+POLL_INTERVAL = 0.001  # フレームを待つ間にイベントを取り出す間隔（秒）
+PRELOAD_BUDGET = 0.004  # スタート画面の1フレームで前もって読み込む処理に使う時間（秒）
+LEADERBOARD_SIZE = 5  # スタート画面に表示するスコアの件数
+GHOST = 0x80  # 描画用のマスの値で、落下位置の枠線を表すビット（パレットの番号と組み合わせる）
+STALE = 0xFF  # 描き直しが必要なマスとして shadow に書く値（どのマスの値とも一致しない）
+
+# 爆発エフェクト
+EXPLOSION_FRAMES = 8
+EXPLOSION_COLORS = ((255, 255, 0), (255, 165, 0), (255, 0, 0))  # 黄色、オレンジ、赤
 
 # 色の定義
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
-CYAN = (0, 255, 255)
-YELLOW = (255, 255, 0)
-PURPLE = (255, 0, 255)
-GREEN = (0, 255, 0)
-RED = (255, 0, 0)
-BLUE = (0, 0, 255)
-ORANGE = (255, 165, 0)
 GRAY = (128, 128, 128)  # 初期配置のブロック用の色
 DARK_GRAY = (30, 30, 30)  # 背景用の暗い灰色
 LIGHT_BLUE = (100, 180, 255)  # ボタン用の色
 
-# テトリミノの形状定義
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1], [1, 1]],  # O
-    [[0, 1, 0], [1, 1, 1]],  # T
-    [[0, 1, 1], [1, 1, 0]],  # S
-    [[1, 1, 0], [0, 1, 1]],  # Z
-    [[1, 0, 0], [1, 1, 1]],  # J
-    [[0, 0, 1], [1, 1, 1]]   # L
-]
-
-# テトリミノの色
-SHAPE_COLORS = [CYAN, YELLOW, PURPLE, GREEN, RED, BLUE, ORANGE]
-# 初期配置のブロック用の特別な色
-INITIAL_BLOCK_COLOR = (100, 100, 200)  # 青みがかった色
+# キー入力と操作の対応（キーの番号は load_pygame() で KEY_ACTIONS に読み替える）
+KEY_NAMES = {
+    'K_LEFT': ACTION_LEFT,
+    'K_RIGHT': ACTION_RIGHT,
+    'K_DOWN': ACTION_SOFT_DROP,
+    'K_UP': ACTION_HARD_DROP,
+    'K_a': ACTION_ROTATE_CCW,  # 反時計回り
+    'K_d': ACTION_ROTATE_CW,   # 時計回り
+    'K_s': ACTION_HOLD,        # ホールド
+}
+KEY_ACTIONS = {}
 
 # ゲームの状態
 GAME_STATE_START = 0
 GAME_STATE_PLAYING = 1
 GAME_STATE_GAMEOVER = 2
 GAME_STATE_WIN = 3
+
+# 画面を使うときだけ読み込む
+pygame = None
+
+def load_pygame():
+    # pygame を読み込み、キーの対応表を作る（2回目以降は何もしない）
+    global pygame
+    if pygame is None:
+        import pygame
+        for name, action in KEY_NAMES.items():
+            KEY_ACTIONS[getattr(pygame, name)] = action
+    return pygame
+
+# フォントはサイズごとに一度だけ読み込む
+_fonts = {}
+
+def get_font(size):
+    font = _fonts.get(size)
+    if font is None:
+        # pygame のデフォルトフォント（SysFont(None, size) と同じフォントだが、
+        # SysFont はシステムのフォント一覧を最初に調べるので起動が遅くなる）
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+@lru_cache(maxsize=256)
+def render_text(text, size, color):
+    # 描画済みの文字列を (文字列, サイズ, 色) ごとに再利用する
+    return get_font(size).render(text, True, color)
+
+# 内容が変わらないパネルは一度だけ描画して再利用する
+_panels = {}
+
+def get_panel(name, builder):
+    panel = _panels.get(name)
+    if panel is None:
+        panel = _panels[name] = builder()
+    return panel
+
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color, text_color=WHITE, font_size=32):
         self.rect = pygame.Rect(x, y, width, height)
@@ -61,8 +123,7 @@ class Button:
         pygame.draw.rect(screen, WHITE, self.rect, 2)  # 白い枠線
         
         # ボタンのテキスト
-        font = pygame.font.SysFont(None, self.font_size)
-        text_surface = font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.text, self.font_size, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
     
@@ -74,330 +135,6 @@ class Button:
         # ボタンがクリックされたかチェック
         return self.rect.collidepoint(mouse_pos) and mouse_click
 
-class Tetris:
-    def __init__(self):
-        self.reset_game()
-    
-    def reset_game(self):
-        self.width = 10
-        self.height = 20
-        self.grid = [[0 for _ in range(self.width)] for _ in range(self.height)]
-        self.initial_blocks_count = 0  # 初期配置されたブロックの数
-        self.setup_initial_blocks()  # 初期ブロックを配置
-        self.next_pieces = [self.generate_piece() for _ in range(5)]  # 次の5つのテトリミノを生成
-        self.current_piece = self.get_next_piece()
-        self.hold_piece = None
-        self.can_hold = True  # ホールドが使用可能かどうか
-        self.game_over = False
-        self.game_won = False  # 勝利フラグ
-        self.score = 0
-    def generate_piece(self):
-        # 新しいテトリミノを生成
-        shape_idx = random.randint(0, len(SHAPES) - 1)
-        piece = {
-            'shape': SHAPES[shape_idx],
-            'color': SHAPE_COLORS[shape_idx],
-            'x': self.width // 2 - len(SHAPES[shape_idx][0]) // 2,
-            'y': 0
-        }
-        return piece
-    
-    def get_next_piece(self):
-        # 次のテトリミノを取得し、新しいテトリミノを追加
-        next_piece = self.next_pieces.pop(0)
-        self.next_pieces.append(self.generate_piece())
-        return next_piece
-    
-    def new_piece(self):
-        # 次のテトリミノを取得
-        return self.get_next_piece()
-    
-    def setup_initial_blocks(self):
-        # 画面の下部にブロックを配置
-        start_row = self.height - 6  # 下から6行分のエリアに配置
-        
-        # ブロックの塊を作成するためのパラメータ
-        cluster_count = 3  # 塊の数
-        cluster_size = 3   # 塊の大きさ
-        
-        # 塊の中心点をランダムに選択
-        cluster_centers = []
-        for _ in range(cluster_count):
-            cx = random.randint(1, self.width - 2)
-            cy = random.randint(start_row + 1, self.height - 2)
-            cluster_centers.append((cx, cy))
-        
-        # 各塊の周りにブロックを配置
-        for cx, cy in cluster_centers:
-            for dy in range(-cluster_size//2, cluster_size//2 + 1):
-                for dx in range(-cluster_size//2, cluster_size//2 + 1):
-                    x, y = cx + dx, cy + dy
-                    # グリッド内かつ中心に近いほど配置確率が高い
-                    if (0 <= x < self.width and start_row <= y < self.height and 
-                        random.random() < 0.6 - 0.15 * (abs(dx) + abs(dy))):
-                        self.grid[y][x] = INITIAL_BLOCK_COLOR
-                        self.initial_blocks_count += 1
-        
-        # 少なくとも12個のブロックを確保
-        if self.initial_blocks_count < 12:
-            additional_needed = 12 - self.initial_blocks_count
-            empty_cells = [(x, y) for y in range(start_row, self.height) 
-                          for x in range(self.width) if self.grid[y][x] == 0]
-            
-            if empty_cells:
-                # ランダムに追加のブロックを配置
-                for _ in range(min(additional_needed, len(empty_cells))):
-                    x, y = random.choice(empty_cells)
-                    empty_cells.remove((x, y))
-                    self.grid[y][x] = INITIAL_BLOCK_COLOR
-                    self.initial_blocks_count += 1
-        
-        # 初期ブロック数を確認
-        actual_count = sum(1 for y in range(self.height) for x in range(self.width) if self.grid[y][x] == INITIAL_BLOCK_COLOR)
-        if actual_count != self.initial_blocks_count:
-            print(f"警告: 初期ブロック数の不一致 - カウント: {self.initial_blocks_count}, 実際: {actual_count}")
-            self.initial_blocks_count = actual_count
-        
-        print(f"初期ブロック数: {self.initial_blocks_count}")
-    def place_bomb_blocks(self):
-        # 初期配置されたブロックの中からランダムに爆弾ブロックを配置
-        initial_blocks = [(x, y) for y in range(self.height) for x in range(self.width) 
-                         if self.grid[y][x] == INITIAL_BLOCK_COLOR]
-        
-        # 爆弾の数を決定（初期ブロックの約15%、最低1個）
-        bomb_count = max(1, self.initial_blocks_count // 7)
-        
-        # ランダムに爆弾ブロックを選択
-        if initial_blocks:
-            for _ in range(min(bomb_count, len(initial_blocks))):
-                x, y = random.choice(initial_blocks)
-                initial_blocks.remove((x, y))
-                self.grid[y][x] = BOMB_BLOCK_COLOR
-                self.bomb_positions.append((x, y))
-                # 爆弾ブロックも初期ブロックの一部なので、カウントは減らさない
-    
-    def explode_bomb(self, row_idx):
-        # 爆弾が消去された時の処理
-        # 爆弾のある行とその下の行を消去（計2行）
-        rows_to_clear = []
-        for r in range(row_idx, min(self.height, row_idx + 2)):
-            rows_to_clear.append(r)
-        
-        # 爆発エフェクトを設定
-        self.explosion_effect = {
-            'center': (row_idx, 5),  # 爆発の中心（行, 列の中央）
-            'radius': 2,             # 爆発の半径（小さくする）
-            'frames': 8,             # エフェクトの表示フレーム数（短くする）
-            'current_frame': 0       # 現在のフレーム
-        }
-        
-        # 初期ブロックのカウントを更新
-        initial_blocks_cleared = 0
-        
-        for r in rows_to_clear:
-            for c in range(self.width):
-                if self.grid[r][c] == INITIAL_BLOCK_COLOR:
-                    initial_blocks_cleared += 1
-        
-        # 初期ブロックの数を更新
-        self.initial_blocks_count -= initial_blocks_cleared
-        print(f"爆弾処理による初期ブロック消去: {initial_blocks_cleared}, 残り: {self.initial_blocks_count}")
-        
-        # 行を消去
-        for r in sorted(rows_to_clear, reverse=True):
-            del self.grid[r]
-            self.grid.insert(0, [0 for _ in range(self.width)])
-        
-        # スコアを加算（通常の2倍）
-        self.score += len(rows_to_clear) * 200
-        
-        # すべての初期ブロックが消えたら勝利
-        if self.initial_blocks_count <= 0:
-            self.game_won = True
-            print("爆弾処理で勝利!")
-        
-        return len(rows_to_clear)
-        
-        # 初期ブロックのカウントを更新
-        initial_blocks_cleared = 0
-        
-        for r in rows_to_clear:
-            for c in range(self.width):
-                if self.grid[r][c] == INITIAL_BLOCK_COLOR:
-                    initial_blocks_cleared += 1
-        
-        # 初期ブロックの数を更新
-        self.initial_blocks_count -= initial_blocks_cleared
-        
-        # 行を消去
-        for r in sorted(rows_to_clear, reverse=True):
-            del self.grid[r]
-            self.grid.insert(0, [0 for _ in range(self.width)])
-        
-        # スコアを加算（通常の2倍）
-        self.score += len(rows_to_clear) * 200
-        
-        # すべての初期ブロックが消えたら勝利
-        if self.initial_blocks_count <= 0:
-            self.game_won = True
-        
-        return len(rows_to_clear)
-    def valid_position(self, shape, x, y):
-        # 指定された位置にテトリミノを配置できるか確認
-        for i, row in enumerate(shape):
-            for j, cell in enumerate(row):
-                if cell:
-                    if (x + j < 0 or x + j >= self.width or
-                        y + i >= self.height or
-                        (y + i >= 0 and self.grid[y + i][x + j])):
-                        return False
-        return True
-
-    def add_to_grid(self):
-        # 現在のテトリミノをグリッドに固定
-        for i, row in enumerate(self.current_piece['shape']):
-            for j, cell in enumerate(row):
-                if cell:
-                    self.grid[self.current_piece['y'] + i][self.current_piece['x'] + j] = self.current_piece['color']
-
-    def clear_rows(self):
-        # 完成した行を消去
-        full_rows = []
-        
-        for i, row in enumerate(self.grid):
-            if all(row):
-                full_rows.append(i)
-        
-        # 通常の行消去処理
-        initial_blocks_cleared = 0
-        
-        for row_idx in full_rows:
-            # 行を消去する前に、その行にある初期ブロックの数をカウント
-            for c, cell in enumerate(self.grid[row_idx]):
-                if cell == INITIAL_BLOCK_COLOR:
-                    initial_blocks_cleared += 1
-                    print(f"初期ブロックを消去: 行 {row_idx}, 列 {c}")
-            
-            del self.grid[row_idx]
-            self.grid.insert(0, [0 for _ in range(self.width)])
-        
-        # 初期ブロックの数を更新
-        if initial_blocks_cleared > 0:
-            self.initial_blocks_count -= initial_blocks_cleared
-            print(f"通常処理後の初期ブロック数: {self.initial_blocks_count}")
-        
-        # すべての初期ブロックが消えたら勝利
-        if self.initial_blocks_count <= 0:
-            print("すべての初期ブロックを消去しました！勝利！")
-            self.game_won = True
-        
-        return len(full_rows)
-    def rotate(self, clockwise=True):
-        # テトリミノを回転
-        shape = self.current_piece['shape']
-        
-        if clockwise:
-            # 時計回り
-            rotated = [[shape[j][i] for j in range(len(shape)-1, -1, -1)] for i in range(len(shape[0]))]
-        else:
-            # 反時計回り
-            rotated = [[shape[j][i] for j in range(len(shape))] for i in range(len(shape[0])-1, -1, -1)]
-        
-        if self.valid_position(rotated, self.current_piece['x'], self.current_piece['y']):
-            self.current_piece['shape'] = rotated
-
-    def move(self, dx, dy):
-        # テトリミノを移動
-        if self.valid_position(self.current_piece['shape'], self.current_piece['x'] + dx, self.current_piece['y'] + dy):
-            self.current_piece['x'] += dx
-            self.current_piece['y'] += dy
-            return True
-        return False
-
-    def hold(self):
-        # ホールド機能
-        if not self.can_hold:
-            return
-        
-        if self.hold_piece is None:
-            # 初めてホールドする場合
-            self.hold_piece = {
-                'shape': copy.deepcopy(self.current_piece['shape']),
-                'color': self.current_piece['color']
-            }
-            self.current_piece = self.new_piece()
-        else:
-            # ホールドを交換する場合
-            temp_shape = copy.deepcopy(self.current_piece['shape'])
-            temp_color = self.current_piece['color']
-            
-            self.current_piece = {
-                'shape': self.hold_piece['shape'],
-                'color': self.hold_piece['color'],
-                'x': self.width // 2 - len(self.hold_piece['shape'][0]) // 2,
-                'y': 0
-            }
-            
-            self.hold_piece = {
-                'shape': temp_shape,
-                'color': temp_color
-            }
-        
-        self.can_hold = False  # 一度ホールドしたら、次のテトリミノが落ちるまで使えない
-
-    def drop(self):
-        # テトリミノを下に落とす
-        if not self.move(0, 1):
-            self.add_to_grid()
-            cleared_rows = self.clear_rows()
-            self.score += cleared_rows * 100
-            
-            # 残りの初期ブロックを確認
-            remaining_blocks = sum(1 for y in range(self.height) for x in range(self.width) if self.grid[y][x] == INITIAL_BLOCK_COLOR)
-            if remaining_blocks != self.initial_blocks_count:
-                print(f"警告: 初期ブロック数の不一致 - カウント: {self.initial_blocks_count}, 実際: {remaining_blocks}")
-                self.initial_blocks_count = remaining_blocks
-            
-            # 勝利判定を追加
-            if self.initial_blocks_count <= 0:
-                print("勝利判定: すべての初期ブロックを消去しました！")
-                self.game_won = True
-                return True
-            
-            # 新しいテトリミノを生成
-            self.current_piece = self.new_piece()
-            self.can_hold = True  # 新しいテトリミノが来たらホールドを再度使用可能に
-            
-            # ゲームオーバー判定
-            if not self.valid_position(self.current_piece['shape'], self.current_piece['x'], self.current_piece['y']):
-                self.game_over = True
-                
-            return True
-        return False
-def draw_grid(screen, grid):
-    # グリッドを描画
-    for y, row in enumerate(grid):
-        for x, cell in enumerate(row):
-            if cell:
-                pygame.draw.rect(screen, cell, 
-                                (x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
-                pygame.draw.rect(screen, WHITE, 
-                                (x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE), 1)
-
-def draw_piece(screen, piece):
-    # 現在のテトリミノを描画
-    for i, row in enumerate(piece['shape']):
-        for j, cell in enumerate(row):
-            if cell:
-                color = piece['color']
-                pygame.draw.rect(screen, color, 
-                                ((piece['x'] + j) * BLOCK_SIZE, 
-                                 (piece['y'] + i) * BLOCK_SIZE, 
-                                 BLOCK_SIZE, BLOCK_SIZE))
-                pygame.draw.rect(screen, WHITE, 
-                                ((piece['x'] + j) * BLOCK_SIZE, 
-                                 (piece['y'] + i) * BLOCK_SIZE, 
-                                 BLOCK_SIZE, BLOCK_SIZE), 1)
 def draw_hold_piece(screen, piece):
     # ホールドエリアの背景
     hold_x = GAME_AREA_WIDTH + 30
@@ -407,32 +144,28 @@ def draw_hold_piece(screen, piece):
     pygame.draw.rect(screen, WHITE, (hold_x - 10, hold_y - 10, 100, 100), 1)
     
     # ホールドテキスト
-    font = pygame.font.SysFont(None, 24)
-    hold_text = font.render('HOLD', True, WHITE)
+    hold_text = render_text('HOLD', 24, WHITE)
     screen.blit(hold_text, (hold_x + 25, hold_y - 30))
     
     # ホールドしているテトリミノを描画
     if piece is not None:
         # I型テトリミノの場合は特別に調整
-        scale = 15 if len(piece['shape'][0]) == 4 else 20
-        offset_x = 15 if len(piece['shape'][0]) == 4 else 20
-        
-        for i, row in enumerate(piece['shape']):
-            for j, cell in enumerate(row):
-                if cell:
-                    pygame.draw.rect(screen, piece['color'], 
-                                   (hold_x + j * scale + offset_x, hold_y + i * scale + 30, scale, scale))
-                    pygame.draw.rect(screen, WHITE, 
-                                   (hold_x + j * scale + offset_x, hold_y + i * scale + 30, scale, scale), 1)
+        scale = 15 if piece.state.width == 4 else 20
+        offset_x = 15 if piece.state.width == 4 else 20
+        
+        for j, i in piece.state.cells:
+            pygame.draw.rect(screen, piece.color, 
+                           (hold_x + j * scale + offset_x, hold_y + i * scale + 30, scale, scale))
+            pygame.draw.rect(screen, WHITE, 
+                           (hold_x + j * scale + offset_x, hold_y + i * scale + 30, scale, scale), 1)
 
 def draw_next_pieces(screen, next_pieces):
-    # 次のテトリミノを描画
+    # 次のテトリミノを描画（next_pieces はテトリミノの種類の並び）
     next_x = GAME_AREA_WIDTH + 30
     next_y = 200  # ホールドの下に配置、さらに下に移動
     
     # 次のテトリミノのテキスト
-    font = pygame.font.SysFont(None, 24)
-    next_text = font.render('NEXT', True, WHITE)
+    next_text = render_text('NEXT', 24, WHITE)
     screen.blit(next_text, (next_x + 25, next_y - 30))
     
     # 表示する次のテトリミノの数を制限（5→3）
@@ -440,24 +173,23 @@ def draw_next_pieces(screen, next_pieces):
     
     # 次のテトリミノを描画（サイズを小さく）
     for idx in range(display_count):
-        piece = next_pieces[idx]
+        piece_type = PIECE_TYPES[next_pieces[idx]]
+        state = piece_type.states[0]
         # 背景（サイズを小さく）
         bg_y = next_y + idx * 70  # 間隔を調整して小さく
         pygame.draw.rect(screen, DARK_GRAY, (next_x - 10, bg_y - 10, 90, 60))
         pygame.draw.rect(screen, WHITE, (next_x - 10, bg_y - 10, 90, 60), 1)
         
         # I型テトリミノの場合は特別に調整
-        scale = 12 if len(piece['shape'][0]) == 4 else 15  # サイズを小さく
-        offset_x = 15 if len(piece['shape'][0]) == 4 else 20
+        scale = 12 if state.width == 4 else 15  # サイズを小さく
+        offset_x = 15 if state.width == 4 else 20
         
         # テトリミノ
-        for i, row in enumerate(piece['shape']):
-            for j, cell in enumerate(row):
-                if cell:
-                    pygame.draw.rect(screen, piece['color'], 
-                                   (next_x + j * scale + offset_x, bg_y + i * scale + 15, scale, scale))
-                    pygame.draw.rect(screen, WHITE, 
-                                   (next_x + j * scale + offset_x, bg_y + i * scale + 15, scale, scale), 1)
+        for j, i in state.cells:
+            pygame.draw.rect(screen, piece_type.color, 
+                           (next_x + j * scale + offset_x, bg_y + i * scale + 15, scale, scale))
+            pygame.draw.rect(screen, WHITE, 
+                           (next_x + j * scale + offset_x, bg_y + i * scale + 15, scale, scale), 1)
 def draw_grid_lines(screen):
     # グリッドの線を描画
     for x in range(0, GAME_AREA_WIDTH, BLOCK_SIZE):  # ゲームエリアのみに線を引く
@@ -475,31 +207,28 @@ def draw_score_area(screen, score, blocks_left):
     pygame.draw.rect(screen, WHITE, (GAME_AREA_WIDTH + 10, 0, SCREEN_WIDTH - GAME_AREA_WIDTH - 20, 40), 1)
     
     # スコアとブロック残数の表示
-    font = pygame.font.SysFont(None, 24)
-    score_text = font.render(f'Score: {score}', True, WHITE)
+    score_text = render_text(f'Score: {score}', 24, WHITE)
     
     # 初期ブロックの残数を表示
-    blocks_text = font.render(f'Blocks: {blocks_left}', True, WHITE)
+    blocks_text = render_text(f'Blocks: {blocks_left}', 24, WHITE)
     
     # 表示位置を調整
     screen.blit(score_text, (score_x, score_y))
     screen.blit(blocks_text, (score_x + 110, score_y))
 
-def draw_controls(screen):
-    # 操作方法表示エリア - 右下に配置
-    controls_x = GAME_AREA_WIDTH + 30
-    controls_y = SCREEN_HEIGHT - 150  # さらに上に移動
+def build_controls_panel():
+    # 操作方法エリアを一度だけ描画する（座標はパネルの左上が原点）
+    panel_width = SCREEN_WIDTH - GAME_AREA_WIDTH - 20
+    panel = pygame.Surface((panel_width, 150))
+    controls_x = 20
+    controls_y = 10
     
     # 操作方法エリアの背景
-    pygame.draw.rect(screen, DARK_GRAY, (GAME_AREA_WIDTH + 10, SCREEN_HEIGHT - 160, 
-                                        SCREEN_WIDTH - GAME_AREA_WIDTH - 20, 150))
-    pygame.draw.rect(screen, WHITE, (GAME_AREA_WIDTH + 10, SCREEN_HEIGHT - 160, 
-                                    SCREEN_WIDTH - GAME_AREA_WIDTH - 20, 150), 1)
+    pygame.draw.rect(panel, DARK_GRAY, (0, 0, panel_width, 150))
+    pygame.draw.rect(panel, WHITE, (0, 0, panel_width, 150), 1)
     
     # 操作方法のテキスト
-    font = pygame.font.SysFont(None, 24)
-    title_text = font.render('CONTROLS', True, WHITE)
-    screen.blit(title_text, (controls_x + 50, controls_y))
+    panel.blit(render_text('CONTROLS', 24, WHITE), (controls_x + 50, controls_y))
     
     # 操作方法を2列に分けて表示
     controls_left = [
@@ -516,62 +245,267 @@ def draw_controls(screen):
     
     # 左側の操作方法
     for i, text in enumerate(controls_left):
-        ctrl_text = font.render(text, True, WHITE)
-        screen.blit(ctrl_text, (controls_x, controls_y + 30 + i * 25))
+        panel.blit(render_text(text, 24, WHITE), (controls_x, controls_y + 30 + i * 25))
     
     # 右側の操作方法
     for i, text in enumerate(controls_right):
-        ctrl_text = font.render(text, True, WHITE)
-        screen.blit(ctrl_text, (controls_x + 120, controls_y + 30 + i * 25))
-def draw_explosion(screen, game):
-    # 爆発エフェクトを描画
-    if game.explosion_effect is None:
-        return
-    
-    effect = game.explosion_effect
-    center_y, center_x = effect['center']
-    radius = effect['radius'] * (effect['current_frame'] / effect['frames'] + 1)
-    
-    # 爆発の中心座標（ピクセル単位）
-    center_x_px = center_x * BLOCK_SIZE + BLOCK_SIZE // 2
-    center_y_px = center_y * BLOCK_SIZE + BLOCK_SIZE // 2
-    
-    # 爆発の色（フレームによって変化）
-    colors = [
-        (255, 255, 0),  # 黄色
-        (255, 165, 0),  # オレンジ
-        (255, 0, 0)     # 赤
-    ]
-    color_idx = effect['current_frame'] % len(colors)
-    
-    # 爆発の円を描画
-    pygame.draw.circle(screen, colors[color_idx], (center_x_px, center_y_px), radius * BLOCK_SIZE, 3)
-    
-    # フレームカウントを更新
-    effect['current_frame'] += 1
-    
-    # エフェクトの終了判定
-    if effect['current_frame'] >= effect['frames']:
-        game.explosion_effect = None
-        # 爆発エフェクトが終わったら新しいテトリミノを生成
-        game.current_piece = game.new_piece()
-        game.can_hold = True
-        
-        # 勝利判定を追加
-        if game.initial_blocks_count <= 0:
-            game.game_won = True
+        panel.blit(render_text(text, 24, WHITE), (controls_x + 120, controls_y + 30 + i * 25))
+    return panel
+
+def draw_controls(screen):
+    # 操作方法表示エリア - 右下に配置
+    screen.blit(get_panel('controls', build_controls_panel), (GAME_AREA_WIDTH + 10, SCREEN_HEIGHT - 160))
+class Renderer:
+    # プレイ画面の差分描画
+    # 前回描画した盤面の内容を覚えておき、変わったマスだけを描き直して
+    # その範囲だけを pygame.display.update() に渡す
+    SIDE_RECT = (GAME_AREA_WIDTH + 1, 0, SCREEN_WIDTH - GAME_AREA_WIDTH - 1, SCREEN_HEIGHT - 160)
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.tiles = {}  # マスの値ごとの画像
+        self.shadow = None  # 前回描画したマスの内容
+        self.side_state = None  # 前回描画したスコア・ホールド・NEXT の内容
+        self.effects = deque()  # 表示中の爆発エフェクト [行, 経過フレーム数]
+        self.view_x = 0  # 表示している範囲の左上のマス
+        self.view_y = 0
+        self.profiler = NULL_PROFILER  # 描画の各段階の時間を計測する場合に差し替える
+
+    def invalidate(self):
+        # 次のフレームで画面全体を描き直す（他の画面から戻ったときなど）
+        self.shadow = None
+        self.side_state = None
+        self.effects.clear()
+        self.view_x = 0
+        self.view_y = 0
+
+    def explode(self, rows):
+        # 爆発した行にエフェクトを出す（rows は EVENT_BOMB の値）
+        for y in rows:
+            self.effects.append([y, 0])
 
-def draw_start_screen(screen, font, large_font):
+    def tile(self, key):
+        # マスの画像を取得（初回のみ作成）
+        # key はパレットの番号（CELL_EMPTY は空きマス）か、GHOST | 番号（落下位置）
+        surface = self.tiles.get(key)
+        if surface is None:
+            surface = pygame.Surface((BLOCK_SIZE, BLOCK_SIZE))
+            if key == CELL_EMPTY or key & GHOST:
+                # 空きマスは背景とグリッド線（上と左の辺）
+                surface.fill(DARK_GRAY)
+                pygame.draw.line(surface, (50, 50, 50), (0, 0), (0, BLOCK_SIZE - 1))
+                pygame.draw.line(surface, (50, 50, 50), (0, 0), (BLOCK_SIZE - 1, 0))
+                if key != CELL_EMPTY:
+                    pygame.draw.rect(surface, PALETTE[key & ~GHOST], (0, 0, BLOCK_SIZE, BLOCK_SIZE), 2)
+            else:
+                surface.fill(PALETTE[key])
+                pygame.draw.rect(surface, WHITE, (0, 0, BLOCK_SIZE, BLOCK_SIZE), 1)
+            self.tiles[key] = surface
+        return surface
+
+    def scroll(self, game, ghost_y):
+        # 表示する範囲を決める（盤面が表示できる大きさに収まる場合は常に全体）
+        # 横はテトリミノが端に近づいたときだけずらす
+        # 縦はテトリミノと落下位置が両方見えるなら落下位置の下を見せ、見えないならテトリミノを追う
+        piece = game.current_piece
+        cells = piece.state.cells
+        columns = min(game.width, VIEW_COLUMNS)
+        rows = min(game.height, VIEW_ROWS)
+        left = piece.x + min(j for j, _ in cells)
+        right = piece.x + max(j for j, _ in cells) + 1
+        view_x = self.view_x
+        if left < view_x + SCROLL_MARGIN:
+            view_x = left - SCROLL_MARGIN
+        elif right > view_x + columns - SCROLL_MARGIN:
+            view_x = right - columns + SCROLL_MARGIN
+        top = piece.y + min(i for _, i in cells) - SCROLL_MARGIN
+        bottom = ghost_y + max(i for _, i in cells) + 1 + SCROLL_MARGIN
+        view_y = bottom - rows if bottom - top <= rows else top
+        self.view_x = max(0, min(view_x, game.width - columns))
+        self.view_y = max(0, min(view_y, game.height - rows))
+        return columns, rows
+
+    def compose(self, game):
+        # 今回のフレームで各マスに表示する内容（盤面＋落下位置＋現在のテトリミノ）
+        # 表示する範囲の行を並べた bytearray で、値はパレットの番号（落下位置は GHOST | 番号）
+        # 盤面が大きくても、作るのは見えている範囲だけ
+        width = game.width
+        piece = game.current_piece
+        value = CELL_PIECE + piece.kind
+        ghost_y = game.landing_row(piece)
+        columns, rows = self.scroll(game, ghost_y)
+        view_x = self.view_x
+        view_y = self.view_y
+        if columns == width and rows == game.height:
+            frame = bytearray(game.grid)
+        else:
+            grid = memoryview(game.grid)
+            frame = bytearray().join(grid[start:start + columns]
+                                     for start in range((view_y * width + view_x),
+                                                        (view_y + rows) * width, width))
+        if ghost_y != piece.y:
+            for j, i in piece.state.cells:
+                x = piece.x + j - view_x
+                y = ghost_y + i - view_y
+                if 0 <= x < columns and 0 <= y < rows:
+                    frame[y * columns + x] = GHOST | value
+        for j, i in piece.state.cells:
+            x = piece.x + j - view_x
+            y = piece.y + i - view_y
+            if 0 <= x < columns and 0 <= y < rows:
+                frame[y * columns + x] = value
+        return frame
+
+    def draw(self, game):
+        # 画面を更新し、描き直した範囲のリストを返す
+        screen = self.screen
+        profiler = self.profiler
+        rects = []
+        frame = self.compose(game)
+        profiler.mark('compose')
+        
+        if self.shadow is None or len(self.shadow) != len(frame):
+            # 画面全体を描き直す
+            screen.fill(BLACK)
+            pygame.draw.rect(screen, DARK_GRAY, (0, 0, GAME_AREA_WIDTH, SCREEN_HEIGHT))
+            draw_grid_lines(screen)
+            draw_controls(screen)
+            self.shadow = bytearray(len(frame))
+            rects.append(screen.get_rect())
+            profiler.mark('draw_background')
+        
+        # 変わったマスだけを描き直す（行ごとに比べ、変わった行だけマスを比べる）
+        shadow = self.shadow
+        width = min(game.width, VIEW_COLUMNS)
+        for start in range(0, len(frame), width):
+            end = start + width
+            if frame[start:end] == shadow[start:end]:
+                continue
+            y = start // width * BLOCK_SIZE
+            for i in range(start, end):
+                cell = frame[i]
+                if cell != shadow[i]:
+                    rect = screen.blit(self.tile(cell), ((i - start) * BLOCK_SIZE, y))
+                    rects.append(rect)
+        self.shadow = frame
+        profiler.mark('draw_grid')
+        
+        if self.effects:
+            rects += self.draw_effects(game)
+            profiler.mark('draw_effects')
+        
+        # スコア・ホールド・NEXT は内容が変わったときだけ描き直す
+        hold = game.hold_piece
+        side_state = (game.score, game.initial_blocks_count,
+                      None if hold is None else (hold.kind, hold.rotation),
+                      game.next_pieces.count)
+        if side_state != self.side_state:
+            screen.fill(BLACK, self.SIDE_RECT)
+            draw_hold_piece(screen, hold)
+            draw_next_pieces(screen, game.next_pieces)
+            draw_score_area(screen, game.score, game.initial_blocks_count)
+            self.side_state = side_state
+            rects.append(self.SIDE_RECT)
+            profiler.mark('draw_side')
+        return rects
+
+    def draw_effects(self, game):
+        # 爆発エフェクトを盤面の上に重ねて描き、描いた範囲を返す
+        # 円が重なったマスは次のフレームで必ず描き直されるように shadow を無効な値にしておく
+        screen = self.screen
+        shadow = self.shadow
+        width = min(game.width, VIEW_COLUMNS)
+        area = pygame.Rect(0, 0, width * BLOCK_SIZE, min(game.height, VIEW_ROWS) * BLOCK_SIZE)
+        screen.set_clip(area)
+        rects = []
+        for effect in self.effects:
+            y, frame = effect
+            radius = BLOCK_SIZE * (1 + frame) // 2 + BLOCK_SIZE
+            center = (width * BLOCK_SIZE // 2, (y - self.view_y) * BLOCK_SIZE + BLOCK_SIZE // 2)
+            rect = pygame.draw.circle(screen, EXPLOSION_COLORS[frame % len(EXPLOSION_COLORS)],
+                                      center, radius, 3).clip(area)
+            effect[1] = frame + 1
+            if not rect.width or not rect.height:
+                continue  # 表示している範囲の外
+            rects.append(rect)
+            left = rect.left // BLOCK_SIZE
+            right = (rect.right - 1) // BLOCK_SIZE + 1
+            stale = bytes((STALE,)) * (right - left)
+            for row in range(rect.top // BLOCK_SIZE, (rect.bottom - 1) // BLOCK_SIZE + 1):
+                shadow[row * width + left:row * width + right] = stale
+        screen.set_clip(None)
+        while self.effects and self.effects[0][1] >= EXPLOSION_FRAMES:
+            self.effects.popleft()
+        return rects
+
+class ProfilerOverlay:
+    # 計測結果を操作方法エリアの上に重ねて表示する
+    # 文字列の描画は重いので、表示内容は interval フレームごとにだけ作り直す
+    RECT = (GAME_AREA_WIDTH + 10, SCREEN_HEIGHT - 160, SCREEN_WIDTH - GAME_AREA_WIDTH - 20, 150)
+
+    def __init__(self, profiler, interval=30):
+        self.profiler = profiler
+        self.interval = interval
+        self.frames = 0
+        self.surface = None
+
+    def build(self):
+        surface = pygame.Surface(self.RECT[2:])
+        surface.fill(BLACK)
+        pygame.draw.rect(surface, WHITE, surface.get_rect(), 1)
+        summary = self.profiler.summary()
+        frame = summary[FRAME]
+        fps = 1000 / frame['mean'] if frame['mean'] else 0
+        font = get_font(18)  # 毎回内容が変わるので文字列のキャッシュは使わない
+        surface.blit(font.render(f"{fps:.0f} fps  (ms, last {self.profiler.window} frames)", True, GREEN), (8, 6))
+        rows = [('', 'p50', 'p99', 'max'), (FRAME, frame['p50'], frame['p99'], frame['max'])]
+        # 入力の遅延と捨てた時間は起きるまで記録されないので、区間の並びに関係なくフレーム全体の次に表示する
+        for name in (INPUT_LATENCY, DROPPED_TIME):
+            s = summary.get(name)
+            if s is not None:
+                rows.append((name, s['p50'], s['p99'], s['max']))
+        rows += [(phase, s['p50'], s['p99'], s['max']) for phase, s in summary.items()
+                 if phase not in (FRAME, INPUT_LATENCY, DROPPED_TIME)]
+        for i, row in enumerate(rows[:8]):
+            y = 22 + i * 16
+            color = GREEN if i < 2 else WHITE
+            surface.blit(font.render(row[0], True, color), (8, y))
+            # 数値は列ごとに右揃え
+            for j, value in enumerate(row[1:]):
+                text = font.render(value if i == 0 else f"{value:.1f}", True, color)
+                surface.blit(text, text.get_rect(topright=(170 + j * 48, y)))
+        return surface
+
+    def draw(self, screen):
+        # 重ねて描画し、更新した範囲を返す
+        if self.surface is None or self.frames % self.interval == 0:
+            self.surface = self.build()
+        self.frames += 1
+        return screen.blit(self.surface, self.RECT)
+
+_buttons = {}
+
+def get_button(text, y, hover_color):
+    # ボタンは一度だけ作成して再利用する（ホバー状態も次のフレームに引き継がれる）
+    button = _buttons.get(text)
+    if button is None:
+        button = _buttons[text] = Button(SCREEN_WIDTH // 2 - 100, y, 200, 50, text, DARK_GRAY, hover_color)
+    return button
+
+def build_start_screen():
+    # スタート画面のボタン以外の部分を一度だけ描画する
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    
     # 背景
     screen.fill(BLACK)
     
     # タイトル
-    title_text = large_font.render("TETRIMINO BREAK", True, WHITE)
+    title_text = render_text("TETRIMINO BREAK", 48, WHITE)
     title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 150))
     screen.blit(title_text, title_rect)
     
     # サブタイトル
-    subtitle_text = font.render("Clear all initial blocks to win!", True, INITIAL_BLOCK_COLOR)
+    subtitle_text = render_text("Clear all initial blocks to win!", 24, INITIAL_BLOCK_COLOR)
     subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH // 2, 220))
     screen.blit(subtitle_text, subtitle_rect)
     
@@ -587,66 +521,243 @@ def draw_start_screen(screen, font, large_font):
     ]
     
     for i, text in enumerate(controls):
-        control_text = font.render(text, True, WHITE)
+        control_text = render_text(text, 24, WHITE)
         control_rect = control_text.get_rect(center=(SCREEN_WIDTH // 2, 320 + i * 30))
         screen.blit(control_text, control_rect)
+    return screen
+
+def build_overlay():
+    # 半透明のオーバーレイ
+    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    overlay.fill((0, 0, 0, 180))  # 半透明の黒
+    return overlay
+
+def build_leaderboard_panel(entries):
+    # スタート画面とゲームオーバー画面の右側に表示するスコアの上位（entries は ScoreStore.leaderboard() の結果）
+    panel = pygame.Surface((170, 40 + LEADERBOARD_SIZE * 25))
+    panel.fill(BLACK)
+    panel.blit(render_text('TOP SCORES', 24, LIGHT_BLUE), (10, 0))
+    if not entries:
+        panel.blit(render_text('no games yet', 24, GRAY), (10, 30))
+    for i, (_, score, result, *_) in enumerate(entries):
+        color = GREEN if result == replay.RESULT_WIN else WHITE
+        panel.blit(render_text(f'{i + 1}.', 24, color), (10, 30 + i * 25))
+        text = render_text(str(score), 24, color)
+        panel.blit(text, text.get_rect(topright=(150, 30 + i * 25)))
+    return panel
+
+def draw_start_screen(screen, leaderboard=None):
+    # leaderboard: build_leaderboard_panel() で作ったスコアの上位（None は表示しない）
+    screen.blit(get_panel('start', build_start_screen), (0, 0))
+    if leaderboard is not None:
+        screen.blit(leaderboard, (SCREEN_WIDTH - 180, 300))
     
     # スタートボタン
-    start_button = Button(SCREEN_WIDTH // 2 - 100, 500, 200, 50, "START", DARK_GRAY, LIGHT_BLUE)
+    start_button = get_button("START", 500, LIGHT_BLUE)
     start_button.draw(screen)
     
     return start_button
-def draw_game_over_screen(screen, font, large_font, score, is_win=False):
+def draw_game_over_screen(screen, score, is_win=False, leaderboard=None):
     # 半透明のオーバーレイ
-    overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 180))  # 半透明の黒
-    screen.blit(overlay, (0, 0))
+    screen.blit(get_panel('overlay', build_overlay), (0, 0))
+    if leaderboard is not None:
+        screen.blit(leaderboard, (SCREEN_WIDTH - 180, 300))
     
     # タイトル
     if is_win:
-        title_text = large_font.render("YOU WIN!", True, GREEN)
+        title_text = render_text("YOU WIN!", 48, GREEN)
     else:
-        title_text = large_font.render("GAME OVER", True, RED)
+        title_text = render_text("GAME OVER", 48, RED)
     
     title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 200))
     screen.blit(title_text, title_rect)
     
     # スコア
-    score_text = font.render(f"Score: {score}", True, WHITE)
+    score_text = render_text(f"Score: {score}", 24, WHITE)
     score_rect = score_text.get_rect(center=(SCREEN_WIDTH // 2, 270))
     screen.blit(score_text, score_rect)
     
     # リトライボタン
-    retry_button = Button(SCREEN_WIDTH // 2 - 100, 350, 200, 50, "RETRY", DARK_GRAY, LIGHT_BLUE)
+    retry_button = get_button("RETRY", 350, LIGHT_BLUE)
     retry_button.draw(screen)
     
     # 終了ボタン
-    quit_button = Button(SCREEN_WIDTH // 2 - 100, 420, 200, 50, "QUIT", DARK_GRAY, RED)
+    quit_button = get_button("QUIT", 420, RED)
     quit_button.draw(screen)
     
     return retry_button, quit_button
-def main():
-    pygame.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+def preload_assets(renderer):
+    # ゲーム中に初めて使うときに作るフォント・パネル・文字列・マスの画像を前もって作る
+    # 1つ作るごとに yield するので、スタート画面のフレームの空き時間に少しずつ進められる
+    for size in (18, 24, 32, 48):
+        get_font(size)
+        yield
+    for name, builder in (('controls', build_controls_panel), ('overlay', build_overlay)):
+        get_panel(name, builder)
+        yield
+    for text, size, color in (('HOLD', 24, WHITE), ('NEXT', 24, WHITE), ('YOU WIN!', 48, GREEN),
+                              ('GAME OVER', 48, RED), ('RETRY', 32, WHITE), ('QUIT', 32, WHITE)):
+        render_text(text, size, color)
+        yield
+    for key in range(len(PALETTE)):
+        renderer.tile(key)
+        yield
+    for kind in range(CELL_PIECE, len(PALETTE)):
+        renderer.tile(GHOST | kind)
+        yield
+
+def run_preload(preload, budget):
+    # preload を budget 秒まで進める（終わったら None を返す）
+    deadline = time.perf_counter() + budget
+    for _ in preload:
+        if time.perf_counter() >= deadline:
+            return preload
+    return None
+
+def print_startup(marks):
+    # 起動時間の内訳（marks は (名前, time.perf_counter() の値) のリスト）
+    last = STARTED
+    for name, t in marks:
+        print(f"{name:<14}{(t - last) * 1000:8.1f} ms  (total {(t - STARTED) * 1000:8.1f} ms)")
+        last = t
+
+def replay_path(path, number):
+    # 2ゲーム目以降のリプレイは "名前-番号.拡張子" に保存する
+    if number <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{number}{ext}"
+
+class EventPump:
+    # フレームの間隔を守りながら、待っている間も POLL_INTERVAL ごとにイベントを取り出して
+    # 取り出した時刻を付けておく（フレームの始めにまとめて取り出すと、押した時刻がフレーム単位になる）
+    def __init__(self, fps):
+        self.frame_time = 1 / fps if fps else 0.0
+        self.last = time.perf_counter() - self.frame_time  # 最初のフレームは待たずに描く
+
+    def wait(self):
+        # 次のフレームまで待ち、(前のフレームからの経過時間, [(時刻, イベント), ...]) を返す
+        events = []
+        deadline = self.last + self.frame_time
+        while True:
+            now = time.perf_counter()
+            for event in pygame.event.get():
+                events.append((now, event))
+            if now >= deadline:
+                break
+            time.sleep(min(POLL_INTERVAL, deadline - now))
+        elapsed = now - self.last
+        self.last = now
+        return elapsed, events
+
+def main(fps=60, vsync=False, record_path=None, randomizer='bag', event_log=None, profiler=None,
+         autoplay=None, autoplay_speed=20, level_pack=None, bombs=False, width=DEFAULT_WIDTH,
+         height=DEFAULT_HEIGHT, key_input=None, startup_time=False, score_store=None):
+    # fps: 描画の最大フレームレート（0 で上限なし）、vsync: 垂直同期を使用
+    # record_path: 指定すると各ゲームのリプレイを保存する
+    # randomizer: テトリミノの選び方（'uniform' / 'bag' / 'history'）
+    # event_log: ゲーム中の出来事の記録先（省略時は記録しない）
+    # profiler: フレームごとの処理時間の計測（省略時は計測しない）
+    # autoplay: 自動でプレイする AI（bot.Bot）、autoplay_speed: AI の1秒あたりの操作数
+    # level_pack: 初期配置を選ぶレベルパック（levels.LevelPack、省略時は毎回作る）
+    # bombs: 初期ブロックの一部を爆弾ブロックにする
+    # width, height: 盤面の大きさ（ゲームエリアより大きい場合はスクロールして表示）
+    # key_input: キー入力の自動リピートの設定（key_input.KeyInput、省略時は既定の DAS / ARR）
+    # startup_time: 最初のフレームを表示するまでと前もって読み込む処理が終わるまでの時間を表示して終了
+    # score_store: ゲームの結果の保存先（score_store.ScoreStore、省略時は保存しない）
+    startup = [('import', time.perf_counter())]
+    if event_log is None:
+        event_log = make_event_log('off')
+    if profiler is None:
+        profiler = make_profiler()
+    if key_input is None:
+        key_input = KeyInput()
+    key_input.instant_repeat = width  # ARR 0 のときは盤面の端まで動かす
+    load_pygame()
+    startup.append(('pygame import', time.perf_counter()))
+    # 使うサブシステム（画面とフォント）だけを初期化する（pygame.init() は音声なども初期化する）
+    pygame.display.init()
+    pygame.font.init()
+    if vsync:
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SCALED, vsync=1)
+    else:
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption('Tetrimino Break')
+    startup.append(('pygame init', time.perf_counter()))
     
-    # フォントの設定
-    try:
-        # システムのデフォルトフォント
-        font = pygame.font.SysFont(None, 24)
-        large_font = pygame.font.SysFont(None, 48)
-    except:
-        # フォールバック
-        font = pygame.font.Font(None, 24)
-        large_font = pygame.font.Font(None, 48)
-    
-    clock = pygame.time.Clock()
-    game = Tetris()
+    pump = EventPump(fps)
+    game = Tetris(randomizer=randomizer, event_log=event_log, level_pack=level_pack, bombs=bombs,
+                  width=width, height=height)
+    renderer = Renderer(screen)
+    renderer.profiler = profiler
+    overlay = ProfilerOverlay(profiler) if profiler.overlay else None
+    preload = preload_assets(renderer)  # スタート画面を表示している間に進める
     
     # 落下速度の設定
-    fall_time = 0
     fall_speed = 1.0  # 秒 (0.5から1.0に変更して半分の速度に)
     
+    # シミュレーションは描画とは別に固定時間刻みで進める
+    timestep = FixedTimestep()
+    gravity = GravityTimer(fall_speed)
+    autoplay_timer = GravityTimer(1 / autoplay_speed)
+    
+    # リプレイの記録
+    # （スコアと一緒にリプレイを保存する場合は、ファイルに保存しなくても記録する）
+    recorder = None
+    recorded_games = 0
+    keep_replays = record_path or (score_store is not None and score_store.replays)
+    initial_blocks = 0  # ゲーム開始時の初期ブロック数
+    
+    def load_leaderboard():
+        # スコアの上位を読み直して表示用のパネルを作る（まだ書き込んでいない結果も含まれる）
+        if score_store is None:
+            return None
+        return build_leaderboard_panel(score_store.leaderboard(LEADERBOARD_SIZE, width, height, bombs))
+    
+    leaderboard = load_leaderboard()
+    
+    def save_replay():
+        # 記録中のリプレイを仕上げ、ファイルに保存して返す（記録していなければ None）
+        nonlocal recorder, recorded_games
+        finished = None
+        if recorder is not None:
+            finished = recorder.finish(game, timestep.total_steps)
+            if record_path:
+                recorded_games += 1
+                finished.save(replay_path(record_path, recorded_games))
+            recorder = None
+        return finished
+    
+    def start_game():
+        nonlocal recorder, initial_blocks
+        game.reset_game()
+        renderer.invalidate()
+        timestep.reset()
+        gravity.reset()
+        autoplay_timer.reset()
+        key_input.reset()
+        initial_blocks = game.initial_blocks_count
+        if keep_replays:
+            recorder = replay.ReplayRecorder(game.seed, gravity.interval, randomizer, game.level, bombs,
+                                             width, height)
+    
+    def step(action):
+        # 1ステップ進め、爆発した行があればエフェクトを出す
+        _, events = game.step(action)
+        for event, value in events:
+            if event == EVENT_BOMB:
+                renderer.explode(value)
+    
+    applied = []  # このフレームで反映したキー入力の時刻（画面に出るまでの遅延の計測用）
+    
+    def apply_inputs(actions, at_step):
+        # KeyInput から取り出した (時刻, 操作) を順に反映し、リプレイには at_step のステップとして記録
+        for stamp, action in actions:
+            if recorder is not None:
+                recorder.record(at_step, action)
+            step(action)
+            applied.append(stamp)
+    
     # ゲームの状態
     game_state = GAME_STATE_START
     
@@ -657,15 +768,19 @@ def main():
     
     running = True
     while running:
+        profiler.start_frame()
+        
         # マウス位置とクリック状態を取得
         mouse_pos = pygame.mouse.get_pos()
         mouse_click = False
         
-        # 経過時間を計測
-        delta_time = clock.tick(60) / 1000
+        # 次のフレームまで待つ（待つ間に届いたイベントには届いた時刻が付く）
+        delta_time, events = pump.wait()
+        now = pump.last
+        profiler.mark('wait')
         
-        # イベント処理
-        for event in pygame.event.get():
+        # イベント処理（キー入力は KeyInput に貯め、シミュレーションのステップの中で時刻順に反映する）
+        for stamp, event in events:
             if event.type == pygame.QUIT:
                 running = False
             
@@ -674,92 +789,181 @@ def main():
                     mouse_click = True
             
             if game_state == GAME_STATE_PLAYING:
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        game.move(-1, 0)
-                    elif event.key == pygame.K_RIGHT:
-                        game.move(1, 0)
-                    elif event.key == pygame.K_DOWN:
-                        game.move(0, 1)
-                    elif event.key == pygame.K_UP:
-                        # ハードドロップ
-                        while game.move(0, 1):
-                            pass
-                        game.drop()
-                    elif event.key == pygame.K_a:
-                        game.rotate(False)  # 反時計回り
-                    elif event.key == pygame.K_d:
-                        game.rotate(True)   # 時計回り
-                    elif event.key == pygame.K_s:
-                        game.hold()         # ホールド
+                if event.type == pygame.KEYDOWN and event.key in KEY_ACTIONS:
+                    key_input.press(KEY_ACTIONS[event.key], stamp)
+                elif event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+                    key_input.release(KEY_ACTIONS[event.key], stamp)
+        profiler.mark('events')
         
         # ゲーム状態に応じた処理
         if game_state == GAME_STATE_START:
             # スタート画面
-            start_button = draw_start_screen(screen, font, large_font)
+            start_button = draw_start_screen(screen, leaderboard)
             start_button.update(mouse_pos)
+            profiler.mark('draw_screen')
             
             if start_button.is_clicked(mouse_pos, mouse_click):
                 game_state = GAME_STATE_PLAYING
-                game.reset_game()
+                start_game()
+            
+            if overlay is not None:
+                overlay.draw(screen)
+                profiler.mark('overlay')
+            pygame.display.flip()
+            profiler.mark('present')
+            if len(startup) == 3:
+                startup.append(('first frame', time.perf_counter()))
+            
+            # 次のフレームまでの空き時間で、ゲーム中に使う画像などを作っておく
+            if preload is not None:
+                preload = run_preload(preload, PRELOAD_BUDGET)
+                profiler.mark('preload')
+                if preload is None:
+                    startup.append(('preload', time.perf_counter()))
+                    if startup_time:
+                        print_startup(startup)
+                        running = False
         
         elif game_state == GAME_STATE_PLAYING:
             # 通常のゲームプレイ
-            fall_time += delta_time
-            
-            # 一定時間ごとにテトリミノを落下
-            if fall_time >= fall_speed:
-                game.drop()
-                fall_time = 0
+            # 経過時間分のステップを進め、一定ステップごとにテトリミノを落下
+            # 描画が遅れたフレームでは複数ステップをまとめて進める
+            # キー入力は押した時刻のステップで、そのステップの自然落下の後に反映する
+            first_step = timestep.total_steps
+            dropped_time = timestep.dropped_time
+            steps = timestep.advance(delta_time)
+            if timestep.dropped_time != dropped_time:
+                # 上限を超えて捨てた時間（その分ゲームが遅れる）
+                profiler.record(DROPPED_TIME, (timestep.dropped_time - dropped_time) * 1000)
+            last_end = now - timestep.accumulator  # 最後のステップが表す時間の終わり
+            for k in range(1, steps + 1):
+                if gravity.tick():
+                    step(ACTION_TICK)
+                apply_inputs(key_input.take(last_end - (steps - k) * timestep.step_time), first_step + k)
+                # 自動プレイの操作もステップ単位で行う（リプレイと同じ順番で、自然落下の後）
+                if autoplay is not None and autoplay_timer.tick() and not (game.game_over or game.game_won):
+                    action = autoplay.next_action(game)
+                    if recorder is not None:
+                        recorder.record(first_step + k, action)
+                    step(action)
+            # 最後のステップの後に届いた入力も次のフレームまで待たせずに反映する
+            apply_inputs(key_input.take(now), timestep.total_steps)
+            profiler.mark('sim')
             
             # ゲームオーバー判定
             if game.game_over:
                 game_state = GAME_STATE_GAMEOVER
-                print("ゲームオーバー")
             
             # 勝利判定
             if game.game_won:
                 game_state = GAME_STATE_WIN
-                print("勝利！ゲームクリア画面に移行")
-            
-            # 描画
-            screen.fill(BLACK)
-            
-            # ゲームエリアの背景
-            pygame.draw.rect(screen, DARK_GRAY, (0, 0, GAME_AREA_WIDTH, SCREEN_HEIGHT))
             
-            draw_grid_lines(screen)
-            draw_grid(screen, game.grid)
+            if game.game_over or game.game_won:
+                finished = save_replay()
+                # 結果の書き込みは別のスレッドで行う（ここではキューに入れるだけ）
+                if score_store is not None:
+                    score_store.add(game, initial_blocks, timestep.total_steps, finished)
+                    leaderboard = load_leaderboard()
+                event_log.flush()
             
-            # 現在のテトリミノを描画
-            draw_piece(screen, game.current_piece)
-                
-            draw_hold_piece(screen, game.hold_piece)
-            draw_next_pieces(screen, game.next_pieces)
-            draw_score_area(screen, game.score, game.initial_blocks_count)
-            draw_controls(screen)
+            # 描画（変わった部分だけを画面に送る）
+            dirty_rects = renderer.draw(game)
+            if overlay is not None:
+                dirty_rects.append(overlay.draw(screen))
+                profiler.mark('overlay')
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+            profiler.mark('present')
+            # 入力を反映したフレームが画面に送られるまでの時間（キーを押した時刻から）
+            if applied:
+                if profiler.enabled:
+                    presented = time.perf_counter()
+                    for stamp in applied:
+                        profiler.record(INPUT_LATENCY, (presented - stamp) * 1000)
+                applied.clear()
         
         elif game_state == GAME_STATE_GAMEOVER or game_state == GAME_STATE_WIN:
             # ゲームオーバー/勝利画面
             retry_button, quit_button = draw_game_over_screen(
-                screen, font, large_font, game.score, game_state == GAME_STATE_WIN
+                screen, game.score, game_state == GAME_STATE_WIN, leaderboard
             )
             
             retry_button.update(mouse_pos)
             quit_button.update(mouse_pos)
+            profiler.mark('draw_screen')
             
             if retry_button.is_clicked(mouse_pos, mouse_click):
                 game_state = GAME_STATE_PLAYING
-                game.reset_game()
-                fall_time = 0
+                start_game()
             
             if quit_button.is_clicked(mouse_pos, mouse_click):
                 running = False
+            
+            if overlay is not None:
+                overlay.draw(screen)
+                profiler.mark('overlay')
+            pygame.display.flip()
+            profiler.mark('present')
         
-        pygame.display.flip()
+        profiler.end_frame()
+    
+    # 途中で終了したゲームのリプレイも保存
+    save_replay()
+    event_log.close()
+    if score_store is not None:
+        score_store.close()
+    profiler.close()
     
     pygame.quit()
     sys.exit()
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Tetrimino Break')
+    parser.add_argument('--fps', type=int, default=60, help='描画の最大フレームレート（0 で上限なし）')
+    parser.add_argument('--vsync', action='store_true', help='垂直同期を使用')
+    parser.add_argument('--randomizer', choices=RANDOMIZER_NAMES, default='bag', help='テトリミノの選び方')
+    parser.add_argument('--levels', metavar='PATH', help='初期配置を選ぶレベルパック（levels.py で作成）')
+    parser.add_argument('--bombs', action='store_true', help='初期ブロックの一部を爆弾ブロックにする')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help='盤面の幅（マス数）')
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help='盤面の高さ（マス数）')
+    parser.add_argument('--das', type=int, default=167, help='左右キーを押し続けたときに繰り返し始めるまでの時間（ミリ秒）')
+    parser.add_argument('--arr', type=int, default=33, help='左右キーの繰り返しの間隔（ミリ秒、0 で壁まで一気に移動）')
+    parser.add_argument('--soft-drop', type=int, default=50, help='下キーを押し続けたときの繰り返しの間隔（ミリ秒）')
+    parser.add_argument('--log', choices=SINKS, default='off', help='イベントログの出力先')
+    parser.add_argument('--log-file', metavar='PATH', help='jsonl 形式のイベントログの保存先')
+    parser.add_argument('--profile', action='store_true', help='フレームごとの処理時間を画面に表示')
+    parser.add_argument('--profile-out', metavar='PATH', help='処理時間の集計を保存するファイル（.json / .csv）')
+    parser.add_argument('--autoplay', action='store_true', help='AI が自動でプレイ（デモ用）')
+    parser.add_argument('--bot-depth', type=int, default=3, help='AI が何個先のテトリミノまで読むか')
+    parser.add_argument('--bot-speed', type=int, default=20, help='AI の1秒あたりの操作数')
+    parser.add_argument('--record', metavar='PATH', help='リプレイを保存するファイル')
+    parser.add_argument('--replay', metavar='PATH', nargs='+', help='リプレイを画面なしで再生して検証')
+    parser.add_argument('--scores', metavar='PATH', help='ゲームの結果を保存する SQLite のファイル（スタート画面に上位を表示）')
+    parser.add_argument('--store-replays', action='store_true', help='--scores のファイルにリプレイも保存する')
+    parser.add_argument('--startup-time', action='store_true', help='起動から最初のフレームまでの時間を表示して終了')
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
+    if '--headless' in sys.argv[1:]:
+        # 画面なしで実行（ゲームのルール部分のみを使用）
+        tetris_core.main(sys.argv[1:])
+    else:
+        args = parse_args(sys.argv[1:])
+        if args.replay:
+            sys.exit(replay.main(args.replay + (['--levels', args.levels] if args.levels else [])))
+        autoplay = None
+        if args.autoplay:
+            from bot import Bot
+            autoplay = Bot(args.width, args.height, depth=args.bot_depth)
+        level_pack = None
+        if args.levels:
+            from levels import LevelPack
+            level_pack = LevelPack(args.levels)
+        store = None
+        if args.scores:
+            from score_store import ScoreStore
+            store = ScoreStore(args.scores, args.store_replays)
+        main(args.fps, args.vsync, args.record, args.randomizer, make_event_log(args.log, args.log_file),
+             make_profiler(args.profile, args.profile_out), autoplay, args.bot_speed, level_pack, args.bombs,
+             args.width, args.height, KeyInput(args.das / 1000, args.arr / 1000, args.soft_drop / 1000),
+             args.startup_time, store)
@@ -0,0 +1,622 @@
+# ゲームのルール部分（pygame に依存しない）
+# ヘッドレス実行: python tetris_core.py --headless --games 1000
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from bitboard import BitBoard, remove_cell_rows, top_cell_row
+from event_log import (NULL_LOG, SINKS, EVENT_LOCK, EVENT_ROWS_CLEARED, EVENT_WIN, EVENT_GAME_OVER,
+                       EVENT_INITIAL_BLOCKS_LEFT, EVENT_INITIAL_BLOCK_CLEARED, EVENT_BOMB,
+                       EVENT_COUNT_MISMATCH, make_event_log)
+from pieces import RotationState, intern_state, Piece, SHAPE_COLORS
+from randomizer import RANDOMIZER_NAMES, PieceQueue, make_randomizer
+
+# 初期配置のブロック用の特別な色
+INITIAL_BLOCK_COLOR = (100, 100, 200)  # 青みがかった色
+BOMB_BLOCK_COLOR = (150, 30, 30)  # 爆弾ブロック（暗い赤）
+
+# 盤面のセルの値（パレットの番号）。色は描画するときだけ PALETTE から引く
+# grid は幅×高さの bytearray で、行 y の列 x は grid[y * width + x]
+CELL_EMPTY = 0
+CELL_INITIAL = 1
+CELL_BOMB = 2
+CELL_PIECE = 3  # テトリミノは CELL_PIECE + 種類
+PALETTE = (None, INITIAL_BLOCK_COLOR, BOMB_BLOCK_COLOR) + tuple(SHAPE_COLORS)
+
+# 盤面の大きさ（既定は 10x20。耐久モードや負荷試験では 100x1000 のような大きな盤面も使う）
+DEFAULT_WIDTH = 10
+DEFAULT_HEIGHT = 20
+MIN_WIDTH = 4  # I が横向きで置ける幅
+MIN_HEIGHT = 8  # 初期ブロックを置く下の6行と出現位置の分
+
+# step() に渡す操作
+ACTION_LEFT = 0
+ACTION_RIGHT = 1
+ACTION_ROTATE_CW = 2
+ACTION_ROTATE_CCW = 3
+ACTION_HOLD = 4
+ACTION_SOFT_DROP = 5
+ACTION_HARD_DROP = 6
+ACTION_TICK = 7  # 自然落下の1回分
+ACTIONS = (ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE_CW, ACTION_ROTATE_CCW,
+           ACTION_HOLD, ACTION_SOFT_DROP, ACTION_HARD_DROP, ACTION_TICK)
+
+# step() が返すゲームの状態
+GameState = namedtuple('GameState', ['piece', 'hold_piece', 'score', 'initial_blocks_count',
+                                     'game_over', 'game_won'])
+
+# snapshot() が返すゲーム全体の状態（中身はすべて変更されない値）
+# board: (セルの値の bytes, 行マスク, 列マスク, 行ごとの初期ブロック数)
+# queue: (ランダマイザーの名前, NEXT の状態, 乱数の状態)
+Snapshot = namedtuple('Snapshot', ['board', 'queue', 'current_piece', 'hold_piece', 'can_hold', 'score',
+                                   'initial_blocks_count', 'last_cleared', 'last_exploded', 'game_over',
+                                   'game_won', 'seed', 'level'])
+
+class Tetris:
+    def __init__(self, use_bitboard=True, debug=False, seed=None, randomizer='bag', preview=5,
+                 event_log=None, level_pack=None, bombs=False, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+        # use_bitboard=True で行ビットマスクの盤面バックエンドを使用
+        # debug=True で固定のたびに初期ブロック数を全マス数え直して確認する
+        # seed を指定すると同じ初期配置・テトリミノの順番を再現できる
+        # randomizer は 'uniform' / 'bag' / 'history'、preview は先読みできるテトリミノの数
+        # event_log を渡すとゲーム中の出来事を記録する（省略時は記録しない）
+        # level_pack（levels.LevelPack）を渡すと初期配置を毎回作る代わりにパックから選ぶ
+        # bombs=True で初期ブロックの一部を爆弾にする（爆弾のある行を消すと上下の行も消える）
+        # width, height は盤面の大きさ（マス数）
+        if width < MIN_WIDTH or height < MIN_HEIGHT:
+            raise ValueError(f"盤面は {MIN_WIDTH}x{MIN_HEIGHT} 以上にしてください")
+        self.width = width
+        self.height = height
+        self.use_bitboard = use_bitboard
+        self.debug = debug
+        self.log = event_log if event_log is not None else NULL_LOG
+        self.randomizer_name = randomizer
+        self.preview = preview
+        self.level_pack = level_pack
+        self.bombs = bombs
+        self.grid_version = 0  # 盤面を変更するたびに増やす（スナップショットの使い回し用）
+        self.snap_board = None
+        self.snap_board_version = -1
+        self.snap_queue = None
+        self.snap_queue_owner = None
+        self.snap_queue_count = -1
+        self.reset_game(seed)
+    
+    def reset_game(self, seed=None, level=None):
+        # ゲームごとに乱数を初期化する（シードはリプレイの記録用に保持）
+        # レベルパックを使う場合、level を省略するとシードから選ぶ
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        if self.use_bitboard:
+            self.board = BitBoard(self.width, self.height)
+            self.grid = self.board.cells  # 描画用のセルの値はボードと共有
+        else:
+            self.board = None
+            self.grid = bytearray(self.width * self.height)
+        self.initial_blocks_count = 0  # 初期配置されたブロックの数
+        self.initial_row_counts = [0] * self.height  # 行ごとの初期ブロックの数
+        if self.level_pack is not None:
+            if (self.level_pack.width, self.level_pack.height) != (self.width, self.height):
+                raise ValueError("レベルパックの盤面の大きさが違います")
+            # level を指定した場合も乱数は同じだけ進める（テトリミノの順番がシードだけで決まるように）
+            picked = self.level_pack.pick(self.rng)
+            self.level = picked if level is None else level
+            self.load_level(self.level_pack.rows(self.level))
+        else:
+            self.level = None
+            self.setup_initial_blocks()  # 初期ブロックを配置
+        if self.bombs:
+            self.place_bomb_blocks()
+        # 次のテトリミノの種類（preview 個先まで）
+        self.next_pieces = PieceQueue(make_randomizer(self.randomizer_name, self.rng), self.preview)
+        self.current_piece = self.get_next_piece()
+        self.hold_piece = None
+        self.can_hold = True  # ホールドが使用可能かどうか
+        self.game_over = False
+        self.game_won = False  # 勝利フラグ
+        self.score = 0
+        self.last_cleared = 0  # 直前の固定で消去した行数
+        self.last_exploded = ()  # 直前の固定で爆発した爆弾の行（消去する前の位置）
+    def get_next_piece(self):
+        # 次のテトリミノを取得（キューには自動で次の種類が補充される）
+        return Piece.spawn(self.next_pieces.pop(), self.width)
+    
+    def new_piece(self):
+        # 次のテトリミノを取得
+        return self.get_next_piece()
+    
+    def setup_initial_blocks(self):
+        # 画面の下部にブロックを配置
+        start_row = self.height - 6  # 下から6行分のエリアに配置
+        
+        # ブロックの塊を作成するためのパラメータ
+        cluster_count = max(1, 3 * self.width // 10)  # 塊の数（幅10マスあたり3個）
+        cluster_size = 3   # 塊の大きさ
+        
+        # 塊の中心点をランダムに選択
+        cluster_centers = []
+        for _ in range(cluster_count):
+            cx = self.rng.randint(1, self.width - 2)
+            cy = self.rng.randint(start_row + 1, self.height - 2)
+            cluster_centers.append((cx, cy))
+        
+        # 各塊の周りにブロックを配置
+        grid = self.grid
+        width = self.width
+        for cx, cy in cluster_centers:
+            for dy in range(-cluster_size//2, cluster_size//2 + 1):
+                for dx in range(-cluster_size//2, cluster_size//2 + 1):
+                    x, y = cx + dx, cy + dy
+                    # グリッド内かつ中心に近いほど配置確率が高い
+                    if (0 <= x < self.width and start_row <= y < self.height and 
+                        self.rng.random() < 0.6 - 0.15 * (abs(dx) + abs(dy))):
+                        # 塊が重なった場合は二重に数えない
+                        if grid[y * width + x] != CELL_INITIAL:
+                            self.initial_blocks_count += 1
+                            self.initial_row_counts[y] += 1
+                        grid[y * width + x] = CELL_INITIAL
+        
+        # 少なくとも12個のブロックを確保
+        if self.initial_blocks_count < 12:
+            additional_needed = 12 - self.initial_blocks_count
+            empty_cells = [(x, y) for y in range(start_row, self.height) 
+                          for x in range(width) if grid[y * width + x] == CELL_EMPTY]
+            
+            if empty_cells:
+                # ランダムに追加のブロックを配置
+                for _ in range(min(additional_needed, len(empty_cells))):
+                    x, y = self.rng.choice(empty_cells)
+                    empty_cells.remove((x, y))
+                    grid[y * width + x] = CELL_INITIAL
+                    self.initial_blocks_count += 1
+                    self.initial_row_counts[y] += 1
+        
+        self.initial_blocks_ready()
+
+    def load_level(self, rows):
+        # 行ごとのビットマスク（下位ビットが左端）から初期ブロックを配置
+        width = self.width
+        for y, mask in enumerate(rows):
+            if not mask:
+                continue
+            start = y * width
+            for x in range(width):
+                if mask >> x & 1:
+                    self.grid[start + x] = CELL_INITIAL
+            count = bin(mask).count('1')
+            self.initial_row_counts[y] = count
+            self.initial_blocks_count += count
+        self.initial_blocks_ready()
+
+    def initial_blocks_ready(self):
+        # グリッドを直接書き換えたのでマスクを再計算
+        if self.board is not None:
+            self.board.rebuild()
+        self.grid_version += 1
+        
+        # 初期ブロック数を確認（デバッグモードのみ）
+        if self.debug:
+            self.verify_initial_blocks()
+        
+        self.log.emit(EVENT_INITIAL_BLOCKS_LEFT, self.initial_blocks_count)
+
+    def verify_initial_blocks(self):
+        # 全マスを数え直して、初期ブロック数と行ごとの数が正しいか確認
+        width = self.width
+        row_counts = [self.grid.count(CELL_INITIAL, y * width, (y + 1) * width) +
+                      self.grid.count(CELL_BOMB, y * width, (y + 1) * width) for y in range(self.height)]
+        actual_count = sum(row_counts)
+        if actual_count != self.initial_blocks_count or row_counts != self.initial_row_counts:
+            self.log.emit(EVENT_COUNT_MISMATCH, (self.initial_blocks_count, actual_count))
+            self.initial_blocks_count = actual_count
+            self.initial_row_counts = row_counts
+        return actual_count
+    def place_bomb_blocks(self):
+        # 初期配置されたブロックの中からランダムに爆弾ブロックを選ぶ
+        # 爆弾ブロックも初期ブロックの一部なので、初期ブロックの数は変わらない
+        initial_blocks = [i for i, cell in enumerate(self.grid) if cell == CELL_INITIAL]
+        
+        # 爆弾の数を決定（初期ブロックの約15%、最低1個）
+        bomb_count = min(max(1, self.initial_blocks_count // 7), len(initial_blocks))
+        for i in self.rng.sample(initial_blocks, bomb_count):
+            self.grid[i] = CELL_BOMB
+        self.grid_version += 1
+
+    def blast_rows(self, full_rows):
+        # 消える行に爆弾があれば、その上下の行も消す（消える行に入った爆弾も爆発する）
+        # 爆発は隣の行にしか届かないので、連続した爆弾の行のどれかが消える行に入ればまとめて爆発する
+        # 爆弾のある完成した行から上下に連続した爆弾の行をたどって連鎖をまとめて求め、
+        # (消す行, 爆発した爆弾の行) を返す（調べるのは連鎖した行だけで、盤面の高さによらない）
+        width = self.width
+        height = self.height
+        grid = self.grid
+
+        def has_bomb(r):
+            return 0 <= r < height and CELL_BOMB in grid[r * width:(r + 1) * width]
+
+        removed = set(full_rows)
+        exploded = set()
+        for r in full_rows:
+            if r in exploded or not has_bomb(r):
+                continue
+            top = r
+            while has_bomb(top - 1):
+                top -= 1
+            bottom = r + 1
+            while has_bomb(bottom):
+                bottom += 1
+            exploded.update(range(top, bottom))
+            removed.update(range(max(0, top - 1), min(height, bottom + 1)))
+        return sorted(removed), sorted(exploded)
+
+    def remove_rows(self, rows, top=None):
+        # 行を消去して上の行を詰める（グリッドと行ごとの初期ブロック数の両方）
+        # ブロックのある一番上の行 (top、省略時は求める) から下だけを1回ずつずらすので、
+        # 盤面が高くても空の部分は触らない
+        if not rows:
+            return
+        if top is None:
+            top = self.top_row()
+        if self.board is not None:
+            self.board.remove_rows(rows, top)
+        else:
+            remove_cell_rows(self.grid, self.width, rows, top)
+        remove_cell_rows(self.initial_row_counts, 1, rows, top)
+        self.grid_version += 1
+    def valid_position(self, shape, x, y):
+        # 指定された位置にテトリミノを配置できるか確認
+        # shape には回転状態か、形状のリストを渡す
+        state = shape if isinstance(shape, RotationState) else intern_state(shape)
+        if self.board is not None:
+            return not self.board.collides(state.masks, x, y)
+        width = self.width
+        for j, i in state.cells:
+            if (x + j < 0 or x + j >= width or
+                y + i >= self.height or
+                (y + i >= 0 and self.grid[(y + i) * width + x + j])):
+                return False
+        return True
+
+    def add_to_grid(self):
+        # 現在のテトリミノをグリッドに固定
+        piece = self.current_piece
+        self.grid_version += 1
+        value = CELL_PIECE + piece.kind
+        if self.board is not None:
+            state = piece.state
+            self.board.place(state.masks, state.cells, piece.x, piece.y, value)
+            return
+        for j, i in piece.state.cells:
+            self.grid[(piece.y + i) * self.width + piece.x + j] = value
+
+    def top_row(self):
+        # ブロックがある一番上の行（空の盤面では height）
+        if self.board is not None:
+            return self.board.top_row()
+        return top_cell_row(self.grid, self.width)
+
+    def clear_rows(self):
+        # 完成した行を消去（爆弾を使う場合は爆発した行もまとめて消去）
+        # 調べるのも詰めるのもブロックのある一番上の行から下だけなので、盤面の高さによらない
+        top = self.top_row()
+        if self.board is not None:
+            full_rows = self.board.full_rows(top)
+        else:
+            width = self.width
+            full_rows = [i for i in range(top, self.height)
+                         if CELL_EMPTY not in self.grid[i * width:(i + 1) * width]]
+        
+        removed = full_rows
+        self.last_exploded = ()
+        if self.bombs and full_rows:
+            removed, exploded = self.blast_rows(full_rows)
+            if exploded:
+                self.last_exploded = tuple(exploded)
+                blasted = len(removed) - len(full_rows)
+                # 爆発で消えた行のスコアは通常の2倍
+                self.score += blasted * 200
+                self.log.emit(EVENT_BOMB, self.last_exploded)
+        
+        # 消去する行の初期ブロックの数は行ごとの数から求める
+        initial_blocks_cleared = sum(self.initial_row_counts[r] for r in removed)
+        
+        if self.debug and self.log.enabled:
+            for row_idx in removed:
+                for c, cell in enumerate(self.grid[row_idx * self.width:(row_idx + 1) * self.width]):
+                    if cell == CELL_INITIAL or cell == CELL_BOMB:
+                        self.log.emit(EVENT_INITIAL_BLOCK_CLEARED, (row_idx, c))
+        
+        # 行をまとめて消去して詰める
+        self.remove_rows(removed, top)
+        
+        if full_rows:
+            self.log.emit(EVENT_ROWS_CLEARED, len(full_rows))
+        
+        # 初期ブロックの数を更新
+        if initial_blocks_cleared > 0:
+            self.initial_blocks_count -= initial_blocks_cleared
+            self.log.emit(EVENT_INITIAL_BLOCKS_LEFT, self.initial_blocks_count)
+        
+        # すべての初期ブロックが消えたら勝利
+        if self.initial_blocks_count <= 0:
+            self.win()
+        
+        return len(full_rows)
+
+    def win(self):
+        # 勝利（イベントは最初の1回だけ記録）
+        if not self.game_won:
+            self.game_won = True
+            self.log.emit(EVENT_WIN)
+    def rotate(self, clockwise=True):
+        # テトリミノを回転（回転状態は事前計算済みのものを使う）
+        rotated = self.current_piece.rotated(clockwise)
+        if self.valid_position(rotated.state, rotated.x, rotated.y):
+            self.current_piece = rotated
+
+    def move(self, dx, dy):
+        # テトリミノを移動
+        piece = self.current_piece
+        if self.valid_position(piece.state, piece.x + dx, piece.y + dy):
+            self.current_piece = piece.moved(dx, dy)
+            return True
+        return False
+
+    def hold(self):
+        # ホールド機能
+        if not self.can_hold:
+            return
+        
+        # Piece は変更されないので、コピーせずにそのまま保持できる
+        if self.hold_piece is None:
+            # 初めてホールドする場合
+            self.hold_piece = self.current_piece
+            self.current_piece = self.new_piece()
+        else:
+            # ホールドを交換する場合（回転状態はそのままで上端中央から出現）
+            held = self.hold_piece
+            self.hold_piece = self.current_piece
+            self.current_piece = Piece.spawn(held.kind, self.width, held.rotation)
+        
+        self.can_hold = False  # 一度ホールドしたら、次のテトリミノが落ちるまで使えない
+
+    def drop(self):
+        # テトリミノを下に落とす
+        if not self.move(0, 1):
+            self.add_to_grid()
+            if self.log.enabled:
+                self.log.emit(EVENT_LOCK, self.current_piece.key())
+            cleared_rows = self.clear_rows()
+            self.score += cleared_rows * 100
+            self.last_cleared = cleared_rows
+            
+            # 残りの初期ブロックを全マス数え直して確認（デバッグモードのみ）
+            if self.debug:
+                self.verify_initial_blocks()
+            
+            # 勝利判定を追加
+            if self.initial_blocks_count <= 0:
+                self.win()
+                return True
+            
+            # 新しいテトリミノを生成
+            self.current_piece = self.new_piece()
+            self.can_hold = True  # 新しいテトリミノが来たらホールドを再度使用可能に
+            
+            # ゲームオーバー判定
+            if not self.valid_position(self.current_piece.state, self.current_piece.x, self.current_piece.y):
+                self.game_over = True
+                self.log.emit(EVENT_GAME_OVER)
+                
+            return True
+        return False
+
+    def landing_row(self, piece=None):
+        # テトリミノがそのまま落ちたときに止まる y 座標（ゴースト表示やハードドロップ用）
+        if piece is None:
+            piece = self.current_piece
+        state = piece.state
+        if self.board is not None:
+            # 今の位置で重なっている場合（ホールド直後など）は動かせない
+            if self.board.collides(state.masks, piece.x, piece.y):
+                return piece.y
+            return piece.y + self.board.drop_distance(state.bottoms, piece.x, piece.y)
+        y = piece.y
+        while self.valid_position(state, piece.x, y + 1):
+            y += 1
+        return y
+
+    def hard_drop(self):
+        # 一番下まで移動してから固定
+        piece = self.current_piece
+        self.current_piece = piece.moved(0, self.landing_row(piece) - piece.y)
+        return self.drop()
+
+    def snapshot(self):
+        # ゲームの状態を Snapshot にまとめる（restore() で戻せる）
+        # 盤面と NEXT・乱数は前回の snapshot() から変わっていなければ同じ値を使い回すので、
+        # 固定と固定の間の操作ではほとんどコストがかからない
+        # （乱数は NEXT の補充にだけ使うので、取り出した回数が同じなら状態も同じ）
+        if self.snap_board_version != self.grid_version:
+            board = self.board
+            if board is not None:
+                self.snap_board = (bytes(self.grid), tuple(board.rows), tuple(board.columns), board.top,
+                                   tuple(self.initial_row_counts))
+            else:
+                self.snap_board = (bytes(self.grid), None, None, None, tuple(self.initial_row_counts))
+            self.snap_board_version = self.grid_version
+        queue = self.next_pieces
+        if self.snap_queue_owner is not queue or self.snap_queue_count != queue.count:
+            self.snap_queue = (self.randomizer_name, queue.get_state(), self.rng.getstate())
+            self.snap_queue_owner = queue
+            self.snap_queue_count = queue.count
+        return Snapshot(self.snap_board, self.snap_queue, self.current_piece, self.hold_piece, self.can_hold,
+                        self.score, self.initial_blocks_count, self.last_cleared, self.last_exploded,
+                        self.game_over, self.game_won, self.seed, self.level)
+
+    def restore(self, snap):
+        # snapshot() の時点の状態に戻す（同じバックエンドの Tetris で取ったもの）
+        # 盤面や NEXT が snapshot() の時点から変わっていなければ戻さない
+        # 描画側が参照しているグリッドの bytearray は差し替えずに中身を入れ替える
+        if snap.board is not self.snap_board or self.snap_board_version != self.grid_version:
+            cells, rows, columns, top, row_counts = snap.board
+            self.grid[:] = cells
+            if self.board is not None:
+                self.board.rows[:] = rows
+                self.board.columns[:] = columns
+                self.board.top = top
+            self.initial_row_counts[:] = row_counts
+            self.grid_version += 1
+            self.snap_board = snap.board
+            self.snap_board_version = self.grid_version
+
+        queue = self.next_pieces
+        if (snap.queue is not self.snap_queue or self.snap_queue_owner is not queue or
+                self.snap_queue_count != queue.count):
+            randomizer_name, queue_state, rng_state = snap.queue
+            if randomizer_name != self.randomizer_name:
+                self.randomizer_name = randomizer_name
+                self.next_pieces = PieceQueue(make_randomizer(randomizer_name, self.rng), self.preview)
+            self.rng.setstate(rng_state)
+            self.next_pieces.set_state(queue_state)
+            self.snap_queue = snap.queue
+            self.snap_queue_owner = self.next_pieces
+            self.snap_queue_count = self.next_pieces.count
+
+        self.current_piece = snap.current_piece
+        self.hold_piece = snap.hold_piece
+        self.can_hold = snap.can_hold
+        self.score = snap.score
+        self.initial_blocks_count = snap.initial_blocks_count
+        self.last_cleared = snap.last_cleared
+        self.last_exploded = snap.last_exploded
+        self.game_over = snap.game_over
+        self.game_won = snap.game_won
+        self.seed = snap.seed
+        self.level = snap.level
+
+    def state(self):
+        return GameState(self.current_piece, self.hold_piece, self.score, self.initial_blocks_count,
+                         self.game_over, self.game_won)
+
+    def step(self, action):
+        # 1つの操作を適用し、(状態, イベントのリスト) を返す
+        events = []
+        if self.game_over or self.game_won:
+            return self.state(), events
+        
+        locked = False
+        if action == ACTION_LEFT:
+            self.move(-1, 0)
+        elif action == ACTION_RIGHT:
+            self.move(1, 0)
+        elif action == ACTION_ROTATE_CW:
+            self.rotate(True)
+        elif action == ACTION_ROTATE_CCW:
+            self.rotate(False)
+        elif action == ACTION_HOLD:
+            self.hold()
+        elif action == ACTION_SOFT_DROP:
+            self.move(0, 1)
+        elif action == ACTION_HARD_DROP:
+            locked = self.hard_drop()
+        elif action == ACTION_TICK:
+            locked = self.drop()
+        else:
+            raise ValueError(f"不明な操作: {action}")
+        
+        if locked:
+            events.append((EVENT_LOCK, None))
+            if self.last_cleared:
+                events.append((EVENT_ROWS_CLEARED, self.last_cleared))
+            if self.last_exploded:
+                events.append((EVENT_BOMB, self.last_exploded))
+            if self.game_won:
+                events.append((EVENT_WIN, None))
+            elif self.game_over:
+                events.append((EVENT_GAME_OVER, None))
+        return self.state(), events
+
+
+def random_policy(game, rng):
+    # ランダムに操作を選ぶ（ヘッドレス実行の既定の操作方法）
+    return rng.choice(ACTIONS)
+
+
+def run_headless(games=1000, seed=None, max_steps=10000, policy=random_policy, use_bitboard=True,
+                 randomizer='bag', event_log=None, level_pack=None, bombs=False, width=DEFAULT_WIDTH,
+                 height=DEFAULT_HEIGHT):
+    # 画面なしでゲームを連続実行し、集計結果を返す
+    rng = random.Random(seed)
+    game = Tetris(use_bitboard=use_bitboard, seed=0, randomizer=randomizer, event_log=event_log,
+                  level_pack=level_pack, bombs=bombs, width=width, height=height)
+    wins = 0
+    total_score = 0
+    total_steps = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        game.reset_game(rng.getrandbits(32))
+        for _ in range(max_steps):
+            game.step(policy(game, rng))
+            total_steps += 1
+            if game.game_over or game.game_won:
+                break
+        wins += game.game_won
+        total_score += game.score
+    elapsed = time.perf_counter() - start
+    return {
+        'games': games,
+        'wins': wins,
+        'average_score': total_score / games if games else 0,
+        'steps': total_steps,
+        'elapsed': elapsed,
+        'games_per_sec': games / elapsed if elapsed > 0 else 0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tetrimino Break (headless)')
+    parser.add_argument('--headless', action='store_true', help='画面なしで実行')
+    parser.add_argument('--games', type=int, default=1000, help='実行するゲーム数')
+    parser.add_argument('--seed', type=int, default=None, help='乱数のシード')
+    parser.add_argument('--max-steps', type=int, default=10000, help='1ゲームあたりの最大操作数')
+    parser.add_argument('--randomizer', choices=RANDOMIZER_NAMES, default='bag', help='テトリミノの選び方')
+    parser.add_argument('--log', choices=SINKS, default='off', help='イベントログの出力先')
+    parser.add_argument('--log-file', metavar='PATH', help='jsonl 形式のイベントログの保存先')
+    parser.add_argument('--levels', metavar='PATH', help='初期配置を選ぶレベルパック（levels.py で作成）')
+    parser.add_argument('--bombs', action='store_true', help='初期ブロックの一部を爆弾ブロックにする')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help='盤面の幅（マス数）')
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help='盤面の高さ（マス数）')
+    parser.add_argument('--bot', action='store_true', help='ランダムな操作の代わりに AI でプレイ')
+    parser.add_argument('--bot-depth', type=int, default=3, help='AI が何個先のテトリミノまで読むか')
+    parser.add_argument('--bot-beam', type=int, default=8, help='AI のビームサーチの幅')
+    args = parser.parse_args(argv)
+    
+    policy = random_policy
+    if args.bot:
+        from bot import Bot
+        bot = Bot(args.width, args.height, depth=args.bot_depth, beam_width=args.bot_beam)
+        policy = bot.policy
+    level_pack = None
+    if args.levels:
+        from levels import LevelPack
+        level_pack = LevelPack(args.levels)
+    event_log = make_event_log(args.log, args.log_file)
+    result = run_headless(args.games, args.seed, args.max_steps, policy, randomizer=args.randomizer,
+                          event_log=event_log, level_pack=level_pack, bombs=args.bombs, width=args.width,
+                          height=args.height)
+    event_log.close()
+    if level_pack is not None:
+        level_pack.close()
+    print(f"games: {result['games']}  wins: {result['wins']}  "
+          f"average score: {result['average_score']:.1f}  "
+          f"{result['games_per_sec']:.1f} games/sec")
+    if args.bot:
+        stats = bot.stats()
+        print(f"placements evaluated: {stats['evaluated']}  "
+              f"{stats['placements_per_sec']:.0f} placements/sec  cache hits: {stats['cache_hits']}")
+
+
+if __name__ == "__main__":
+    main()